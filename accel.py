@@ -0,0 +1,54 @@
+'''
+Gravitational accelerations computed directly from particle positions and masses.
+
+Used by bin_find_sim for the tidal test, so that snapshots do not have to be integrated
+forward just to refresh the accelerations stored by rebound.
+'''
+import numpy as np
+
+##Maximum number of (target, source) pairs handled at once by grav_acc. Bounds the size of the
+##temporary arrays (a few doubles per pair); small enough to stay in cache.
+ACC_BLOCK=2**16
+
+
+def grav_acc(xyz, ms, idx=None, G=1., softening=0., block=ACC_BLOCK, src=None):
+	'''
+	Gravitational acceleration of the particles idx (default all) due to the particles src 
+	(default all), by direct summation (same softening as rebound's basic gravity).
+
+	xyz, ms -- Particle positions and masses.
+	block -- Maximum number of particle pairs to handle at once.
+
+	Returns an array of shape (len(idx), 3).
+	'''
+	ms=np.asarray(ms, dtype=float)
+	N=len(ms)
+	if idx is None:
+		idx=np.arange(N)
+	idx=np.atleast_1d(idx).astype(int)
+	if src is None:
+		src=np.arange(N)
+	src=np.atleast_1d(src).astype(int)
+	x,y,z=[np.ascontiguousarray(xyz[src,kk], dtype=float) for kk in range(3)]
+	msrc=ms[src]
+	##Column of each particle among the sources (-1 if it is not one)
+	col=-np.ones(N, dtype=int)
+	col[src]=np.arange(len(src))
+	acc=np.zeros([len(idx), 3])
+	rows=max(1, block//max(len(src), 1))
+	for k0 in range(0, len(idx), rows):
+		ii=idx[k0:k0+rows]
+		dx=x[None,:]-xyz[ii,0,None]
+		dy=y[None,:]-xyz[ii,1,None]
+		dz=z[None,:]-xyz[ii,2,None]
+		w=dx*dx+dy*dy+dz*dz+softening**2.
+		##No self-force
+		self_src=(col[ii]>=0)
+		w[np.where(self_src)[0], col[ii][self_src]]=np.inf
+		##G m_j/r^3
+		w*=np.sqrt(w)
+		np.divide(G*msrc, w, out=w)
+		acc[k0:k0+rows,0]=np.einsum('ij,ij->i', w, dx)
+		acc[k0:k0+rows,1]=np.einsum('ij,ij->i', w, dy)
+		acc[k0:k0+rows,2]=np.einsum('ij,ij->i', w, dz)
+	return acc
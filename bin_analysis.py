@@ -1,9 +1,17 @@
 import sys
+import os
 sys.path.append('/usr/local/lib/python2.7/dist-packages/')
 import rebound
 import numpy as np
 import matplotlib.pyplot as plt
 from itertools import combinations
+from neighbors import hill_reach, cand_pairs, NeighborList
+import bin_store
+from accel import grav_acc
+from snap_index import archive_digest, snapshot_times
+
+##Maximum number of snapshots handed to a worker at a time by BinAnalysis
+BIN_CHUNK=64
 
 
 def get_com(ps):
@@ -98,7 +106,145 @@ def bin_props(p1, p2):
 	return com_d, a_bin, e_bin, p1_com, p2_com, d2, inc, ft
 
 
-def bin_find(loc):
+##Maximum number of pairs evaluated at once by bin_find_arr. Bounds the size of the
+##temporary arrays (a few tens of doubles per pair).
+PAIR_BLOCK=2**17
+##Largest shift of the com (from removed stars) that the candidate pairs in bin_strip_idx are padded for.
+STRIP_SKIN=1.0e-2
+##Kinds of events in the table returned by BinAnalysis.exotica
+TRIPLE=1
+EXCHANGE=2
+
+
+def sim_arrays(sim):
+	'''
+	Pull positions, velocities, accelerations and masses of all particles 
+	in sim into numpy arrays (xyz, vxyz, axyz, ms).
+	'''
+	ps=sim.particles
+	xyz=np.array([pp.xyz for pp in ps])
+	vxyz=np.array([pp.vxyz for pp in ps])
+	axyz=np.array([[pp.ax, pp.ay, pp.az] for pp in ps])
+	ms=np.array([pp.m for pp in ps])
+	return xyz, vxyz, axyz, ms
+
+
+def sim_state(sim):
+	'''
+	Positions, velocities and masses of all particles in sim (xyz, vxyz, ms), 
+	copied on the C side.
+	'''
+	xyz=np.zeros([sim.N, 3])
+	vxyz=np.zeros([sim.N, 3])
+	ms=np.zeros(sim.N)
+	sim.serialize_particle_data(xyz=xyz, vxvyvz=vxyz, m=ms)
+	return xyz, vxyz, ms
+
+
+def pair_blocks(N, block=PAIR_BLOCK):
+	'''
+	Generator over all pairs of indices i1<i2 drawn from 1,...,N-1 (i.e. excluding the SMBH)
+	in chunks of at most ~block pairs. Pairs come out in the same order as 
+	combinations(range(1, N), 2).
+	'''
+	rows=max(1, block//max(N,1))
+	cols=np.arange(N)
+	for r0 in range(1, N, rows):
+		rr=np.arange(r0, min(r0+rows, N))
+		i1,i2=np.nonzero(cols[None,:]>rr[:,None])
+		if len(i1)>0:
+			yield rr[i1], cols[i2]
+
+
+def bin_props_arr(i1, i2, xyz, vxyz, axyz, ms):
+	'''
+	Vectorized version of bin_props: binary properties for all pairs (i1[k], i2[k]).
+
+	xyz, vxyz, axyz, ms -- Arrays of particle positions, velocities, accelerations and masses 
+	(see sim_arrays). 
+
+	Returns com_d, a_bin, e_bin, d2, ft as arrays (one entry per pair).
+	'''
+	m1=ms[i1]
+	m2=ms[i2]
+	mt=m1+m2
+	x1,x2=xyz[i1],xyz[i2]
+	v1,v2=vxyz[i1],vxyz[i2]
+	dp=x1-x2
+	d2=dp[:,0]*dp[:,0]+dp[:,1]*dp[:,1]+dp[:,2]*dp[:,2]
+	##Center of mass position and velocity of each pair
+	com=(m1[:,None]*x1+m2[:,None]*x2)/mt[:,None]
+	vcom=(m1[:,None]*v1+m2[:,None]*v2)/mt[:,None]
+	##rebound's particle arithmetic leaves accelerations untouched, so com.ax in bin_props 
+	##is just the acceleration of p1. Keep the same convention here.
+	acom=axyz[i1]
+	##Particle positions and velocities in com frame
+	x1c,x2c=x1-com,x2-com
+	v1c,v2c=v1-vcom,v2-vcom
+	v12=v1c[:,0]**2.+v1c[:,1]**2.+v1c[:,2]**2.
+	v22=v2c[:,0]**2.+v2c[:,1]**2.+v2c[:,2]**2.
+
+	##Difference in the forces acting on the two particles, minus the mutual force.
+	rhat=dp/(d2**0.5)[:,None]
+	ft=m2[:,None]*axyz[i2]-m2[:,None]*acom
+	ft=ft-(m1*m2/d2)[:,None]*rhat
+	ft=np.sum(ft*ft, axis=1)**0.5
+
+	##Kinetic and potential energies; Assumes G = 1
+	ke=0.5*m1*v12+0.5*m2*v22
+	pe=(m1*m2)/d2**0.5
+
+	com_d=(com[:,0]**2.+com[:,1]**2.+com[:,2]**2.)**0.5
+	with np.errstate(divide='ignore', invalid='ignore'):
+		a_bin=(m1*m2)/(2.*(pe-ke))
+		##Angular momentum in binary com
+		j_bin=m1[:,None]*np.cross(x1c, v1c)+m2[:,None]*np.cross(x2c, v2c)
+		mu=m1*m2/mt
+		e_bin=(1.-np.sum(j_bin*j_bin, axis=1)/(mt*a_bin)/(mu**2.))
+
+	return com_d, a_bin, e_bin, d2, ft
+
+
+def bin_find_arr(t, xyz, vxyz, axyz, ms, pairs=None, block=PAIR_BLOCK):
+	'''
+	Find all binaries from arrays of particle data (see sim_arrays). Particle 0 
+	is assumed to be the SMBH. Pairs are processed in chunks of at most ~block pairs, 
+	so memory use is bounded. 
+
+	pairs -- Optional tuple of index arrays (i1, i2) of candidate pairs to check (e.g. from 
+	neighbors.cand_pairs). By default all pairs are checked.
+
+	Returns the same table as bin_find.
+	'''
+	N=len(ms)
+	##Mass of central SMBH
+	m0=ms[0]
+	if pairs is None:
+		blocks=pair_blocks(N, block)
+	else:
+		blocks=((pairs[0][kk:kk+block], pairs[1][kk:kk+block]) for kk in range(0, len(pairs[0]), block))
+	bin_indics=[]
+	for i1, i2 in blocks:
+		com_d, a_bin, e_bin, d2, ft=bin_props_arr(i1, i2, xyz, vxyz, axyz, ms)
+		m1,m2=ms[i1],ms[i2]
+		rh=((m1+m2)/m0)**(1./3.)*com_d
+		##Hill sphere, energy and tidal conditions
+		with np.errstate(invalid='ignore'):
+			filt=(a_bin>0) & (a_bin<rh) & (m1*m2/d2>ft)
+		if not np.any(filt):
+			continue
+		rh=rh[filt]
+		com_d=com_d[filt]
+		vh=rh*(m0/com_d**3.)**0.5
+		bin_indics.append(np.column_stack([np.ones(len(rh))*t, i1[filt], i2[filt], d2[filt]**0.5, a_bin[filt],\
+			a_bin[filt]/rh, e_bin[filt], rh, vh]))
+
+	if len(bin_indics)==0:
+		return np.array([])
+	return np.concatenate(bin_indics)
+
+
+def bin_find(loc, nlist=None):
 	'''
 	Find all binaries for a given sim and time. 
 
@@ -114,66 +260,352 @@ def bin_find(loc):
 	Next columns are binary separation, sma, ratio of sma to the hill radius, 
 	and the binary eccentricity. 
 
+	nlist -- Optional NeighborList (see neighbors.py) shared between calls for consecutive 
+	snapshots, so that the candidate search is not redone from scratch each time.
+
 	'''
 	t,name=loc
 	sat = rebound.SimulationArchive(name)
 	sim = sat.getSimulation(t)
-	##Ensure we are in the com frame of the simulation.
-	sim.move_to_com()
-	##Integrate forward for a small time to ensure that the accelerations
-	##are in sync with the rest of the simulation (this is important for
-	##calculating tidal forces...
-	sim.integrate(sim.t+sim.t*1.0e-14)
-
-	ps = sim.particles
-	##Mass of central SMBH
-	m0 = ps[0].m
-	bin_indics=[]
-	for i1, i2 in combinations(range(1, sim.N),2): # get all pairs of indices/start at 1 to exclude SMBH
-		##Call bin_props above to extract binary properties
-		com_d, a_bin, e_bin, p1_com, p2_com, d2, inc, ft = bin_props(ps[i1], ps[i2])
-		m1,m2 =ps[i1].m, ps[i2].m
-		##Hill sphere condition.
-		inside_hill=(a_bin<((m1+m2)/m0)**(1./3.)*com_d)
-		tidal_2 = (m1*m2/d2>ft)
-
-		##If the kinetic energy is less than the potential energy 
-		if ((a_bin>0) and (inside_hill) and (tidal_2)):
-		#if ((a_bin>0) and (inside_hill)):
-			rh=(((m1+m2)/m0)**(1./3.)*com_d)
-			vh=rh*(m0/com_d**3.)**0.5
-			bin_indics.append([sim.t, i1, i2, d2**0.5, a_bin, a_bin/(((m1+m2)/m0)**(1./3.)*com_d), e_bin, rh, vh])
-
-	return np.array(bin_indics)
+	return bin_find_sim(sim, nlist=nlist)
 	#return Table(bin_indics, names=['t', 'i1', 'i2', 'bin_sep', 'a_bin', 'a_bin/r_h', 'e_bin', 'rh', 'vh'])
 
  
-def bin_find_sim(sim):
-	##Ensure we are in the com frame of the simulation.
-	sim.move_to_com()
-	##Integrate forward for a small time to ensure that the accelerations
-	##are in sync with 
-	sim.integrate(sim.t+sim.t*1.0e-14)
-	
-	ps = sim.particles
-	##mass of of primary 
-	m0 = ps[0].m
-	bin_indics=[]
-	for i1, i2 in combinations(range(1, sim.N),2): # get all pairs of indices/start at 1 to exclude SMBH
-		com_d, a_bin, e_bin, p1_com, p2_com, d2, inc, ft = bin_props(ps[i1], ps[i2])
-		m1,m2 =ps[i1].m, ps[i2].m
-		##Hill sphere condition.
-		inside_hill=(a_bin<((m1+m2)/m0)**(1./3.)*com_d)
-		tidal_2 = (m1*m2/d2>ft)
-
-		##If the kinetic energy is less than the potential energy 
-		if ((a_bin>0) and (inside_hill) and (tidal_2)):
-			rh=(((m1+m2)/m0)**(1./3.)*com_d)
-			vh=rh*(m0/com_d**3.)**0.5
-			bin_indics.append([sim.t, i1, i2, d2**0.5, a_bin, a_bin/(((m1+m2)/m0)**(1./3.)*com_d), e_bin, rh, vh])
-
-	return np.array(bin_indics)
-	#return Table(bin_indics, names=['t', 'i1', 'i2', 'bin_sep', 'a_bin', 'a_bin/r_h', 'e_bin', 'rh', 'vh'])
+def bin_find_sim(sim, prune=True, nlist=None):
+	'''
+	Same as bin_find, but accepts a simulation object. The simulation is not modified.
+
+	prune -- Only check pairs that are close enough to pass the Hill sphere test
+	(see neighbors.cand_pairs). This does not change the result.
+	nlist -- Optional NeighborList to take the candidate pairs from (implies prune).
+	'''
+	xyz, vxyz, ms=sim_state(sim)
+	##Work in the com frame of the simulation.
+	xyz=xyz-np.sum(ms[:,None]*xyz, axis=0)/np.sum(ms)
+	vxyz=vxyz-np.sum(ms[:,None]*vxyz, axis=0)/np.sum(ms)
+
+	pairs=None
+	if nlist is not None:
+		pairs=nlist.pairs(sim.t, xyz, vxyz, ms)
+	elif prune:
+		pairs=cand_pairs(xyz, hill_reach(xyz, ms))
+	##Accelerations for the tidal test, computed at the current positions (only needed for 
+	##stars in candidate pairs).
+	if pairs is None:
+		axyz=grav_acc(xyz, ms, G=sim.G, softening=sim.softening)
+	else:
+		axyz=np.zeros_like(xyz)
+		idx=np.unique(np.concatenate(pairs))
+		axyz[idx]=grav_acc(xyz, ms, idx, G=sim.G, softening=sim.softening)
+	return bin_find_arr(sim.t, xyz, vxyz, axyz, ms, pairs=pairs)
+
+def bin_strip_idx(sim, local=False, skin=STRIP_SKIN):
+	'''
+	Stars to remove from sim so that it has no binaries left: one member (i1) of each binary
+	found by bin_find_sim, repeated until none are found (removing stars changes the tidal field
+	and com frame). The simulation is not modified.
+
+	Removed stars are dropped from the arrays (given zero mass) instead of the simulation, so the 
+	candidate pairs are only searched once (padded by skin for the shift of the com), and the 
+	accelerations are updated by taking out the pull of the removed stars.
+
+	local -- After the first pass, only check the pairs that involve a neighbor (candidate partner) 
+	of a removed star. Other pairs only see the small shift of the com and of the distant tidal field.
+	With local=False every candidate pair is checked in each pass, as with repeated calls to bin_find_sim.
+
+	Returns the indices of the stars to remove (sorted).
+	'''
+	xyz_sim, vxyz_sim, ms0=sim_state(sim)
+	ms=np.copy(ms0)
+	N=len(ms)
+	alive=np.ones(N, dtype=bool)
+	removed=np.array([], dtype=int)
+	have_acc=np.zeros(N, dtype=bool)
+	axyz=np.zeros([N, 3])
+	pairs=None
+	check=None
+	while True:
+		##com frame of the remaining particles
+		com=np.sum(ms[:,None]*xyz_sim, axis=0)/np.sum(ms)
+		xyz=xyz_sim-com
+		vxyz=vxyz_sim-np.sum(ms[:,None]*vxyz_sim, axis=0)/np.sum(ms)
+		if pairs is None or np.sum((com-com0)**2.)>skin**2.:
+			com0=com
+			pairs=cand_pairs(xyz, hill_reach(xyz, ms, skin))
+			check=None
+		filt=alive[pairs[0]] & alive[pairs[1]]
+		pairs=(pairs[0][filt], pairs[1][filt])
+		sel=pairs
+		if check is not None:
+			filt=check[pairs[0]] | check[pairs[1]]
+			sel=(pairs[0][filt], pairs[1][filt])
+		idx=np.unique(np.concatenate(sel))
+		new=idx[~have_acc[idx]]
+		axyz[new]=grav_acc(xyz, ms, new, G=sim.G, softening=sim.softening)
+		have_acc[new]=True
+
+		bins=bin_find_arr(sim.t, xyz, vxyz, axyz, ms, pairs=sel)
+		if len(bins)==0:
+			return np.sort(removed)
+		to_del=np.unique(bins[:,1]).astype(int)
+		alive[to_del]=False
+		ms[to_del]=0.
+		removed=np.concatenate([removed, to_del])
+		##Take the pull of the removed stars out of the stored accelerations. O(N) per removed star, 
+		##instead of O(N^2) to recompute them.
+		old=np.where(have_acc & alive)[0]
+		axyz[old]-=grav_acc(xyz, ms0, old, G=sim.G, softening=sim.softening, src=to_del)
+		if local:
+			##Neighbors of the removed stars
+			check=np.zeros(N, dtype=bool)
+			check[pairs[1][~alive[pairs[0]]]]=True
+			check[pairs[0][~alive[pairs[1]]]]=True
+
+def bin_strip(sim):
+	'''
+	Remove binaries from sim (see bin_strip_idx). Returns the indices (before removal) of the 
+	stars that were removed.
+	'''
+	removed=bin_strip_idx(sim)
+	##Delete in reverse order (else the indices would become messed up)
+	for idx in removed[::-1]:
+		sim.remove(int(idx))
+	return removed
+
+def iter_snapshots(sa_name, blobs):
+	'''
+	Snapshots of the archive sa_name with blob indices blobs (see snapshot_index), one at a time. 
+	The archive is opened once, and only the current snapshot is kept in memory.
+	'''
+	sat = rebound.SimulationArchive(sa_name)
+	for bb in blobs:
+		yield sat[int(bb)]
+
+def bin_find_iter(sa_name, blobs):
+	'''
+	Bin tables (see bin_find) for the snapshots with blob indices blobs, one snapshot at a time. 
+	Candidate pairs are carried over from one snapshot to the next (see NeighborList).
+	'''
+	nlist = NeighborList()
+	for sim in iter_snapshots(sa_name, blobs):
+		yield bin_find_sim(sim, nlist=nlist)
+
+def bin_find_chunk(loc):
+	'''
+	Find all binaries for a list of snapshots. 
+
+	loc should be a tuple containing the blob indices of the snapshots 
+	(see snapshot_index) and the simulation name. Used by BinAnalysis to hand 
+	contiguous chunks of snapshots to a process pool (see bin_find_iter).
+
+	Returns a list with one table (see bin_find) per snapshot.
+	'''
+	blobs,name=loc
+	return list(bin_find_iter(name, blobs))
+
+def snapshot_index(sa, interval=None):
+	'''
+	Canonical snapshot index for the archive sa: one slot per distinct snapshot time. Duplicate
+	blobs (e.g. left by restarts) are collapsed onto the last one, as in sa.getSimulation.
+
+	interval -- Only keep the last snapshot at or before each multiple of interval (None keeps all).
+
+	Returns the blob indices and times of the slots, and the cadence (median spacing of the slots).
+	'''
+	return snapshot_slots(np.array(sa.t[:len(sa)]), interval)
+
+def snapshot_slots(t, interval=None):
+	'''
+	Same as snapshot_index, but from the times t of all of the blobs (e.g. from snap_index.snapshot_times, 
+	which does not have to load the archive).
+	'''
+	tu,idx=np.unique(t[::-1], return_index=True)
+	blobs=len(t)-1-idx
+	if interval is not None:
+		grid=np.arange(0, tu[-1]+0.05*interval, interval)
+		sel=np.unique(np.searchsorted(tu, grid, side='right')-1)
+		sel=sel[sel>=0]
+		blobs,tu=blobs[sel],tu[sel]
+	cadence=np.median(np.diff(tu)) if len(tu)>1 else 0.
+	return blobs, tu, cadence
+
+def write_meta(sa_name, size):
+	'''
+	Record the size and fingerprint of the part of the archive covered by the bin table 
+	(see BinAnalysis.__bin_update__).
+	'''
+	f=open(sa_name.replace('.bin', '_bins_meta'), 'w')
+	f.write('{0} {1}\n'.format(size, archive_digest(sa_name, size)))
+	f.close()
+
+def read_meta(sa_name):
+	'''
+	Size and fingerprint recorded by write_meta (0 and None for tables from before we kept track 
+	of the archive).
+	'''
+	try:
+		size0,digest0=open(sa_name.replace('.bin', '_bins_meta')).read().split()
+	except IOError:
+		return 0, None
+	return int(size0), digest0
+
+def tables_cover(sa_name, ts_old, ts, size):
+	'''
+	Number of the snapshots to analyze (at times ts, see snapshot_slots) that are already in the bin 
+	tables of the archive sa_name, which list the snapshots at ts_old. None if the tables no longer 
+	match the archive (of size size) and have to be regenerated.
+	'''
+	size0,digest0=read_meta(sa_name)
+	if (size<size0) or (size0>0 and archive_digest(sa_name, size0)!=digest0):
+		return None
+	##The snapshots we already have should still be at the start of the index.
+	ts_old=np.atleast_1d(ts_old)
+	nn=len(np.unique(ts_old))
+	if nn==0 or len(ts)<nn or ts[nn-1]!=ts_old[-1]:
+		return None
+	return nn
+
+class BinTables(object):
+	'''
+	Writes the bin tables of the archive sa_name (_bins.csv, _times, _masses, their binary stores 
+	and _bins_meta) one snapshot at a time.
+
+	New tables are written to temporary files (with a .tmp suffix) that close moves into place after 
+	the last snapshot, followed by the times, masses and meta data, so an analysis that is interrupted 
+	leaves the old tables (if any) as they were.
+
+	t_last -- Add to the existing tables, which cover the snapshots up to t_last, instead. Rows after 
+	t_last (left by an earlier append that was interrupted) are dropped first.
+	'''
+	def __init__(self, sa_name, t_last=None):
+		self.sa_name=sa_name
+		self.csv=sa_name.replace('.bin', '_bins.csv')
+		self.store=bin_store.store_name(sa_name, 'bins')
+		self.append=(t_last is not None)
+		if self.append:
+			rows=bin_store.read_table(self.store, 'bins')
+			if len(rows)>0 and rows['t'][-1]>t_last:
+				rows=np.array(rows[rows['t']<=t_last])
+				f=open(self.csv, 'w')
+				np.savetxt(f, bin_store.from_records(rows).reshape([-1, 9]), delimiter=',')
+				f.close()
+				bin_store.write_table(self.store, rows, 'bins')
+		else:
+			self.csv+='.tmp'
+			self.store+='.tmp'
+			bin_store.write_table(self.store, np.empty([0, 9]), 'bins')
+		self.f=open(self.csv, 'a' if self.append else 'w')
+
+	def add(self, bins):
+		'''
+		Add the binaries of a snapshot (see bin_find).
+		'''
+		if len(bins)>0:
+			np.savetxt(self.f, bins, delimiter=',')
+			##The store is written after the text table, so it is not older (see BinAnalysis.__load_store__).
+			self.f.flush()
+			bin_store.append_table(self.store, bins, 'bins')
+
+	def close(self, ts, masses, size):
+		'''
+		Finish the tables. ts are the times of all of the snapshots in the tables, masses the masses of 
+		the stars, and size the size of the part of the archive they cover (see write_meta).
+		'''
+		self.f.close()
+		if not self.append:
+			os.rename(self.csv, self.sa_name.replace('.bin', '_bins.csv'))
+			os.rename(self.store, bin_store.store_name(self.sa_name, 'bins'))
+		np.savetxt(self.sa_name.replace('.bin', '_times'), ts)
+		np.savetxt(self.sa_name.replace('.bin', '_masses'), masses)
+		bin_store.write_table(bin_store.store_name(self.sa_name, 'times'), np.atleast_1d(ts), 'times')
+		bin_store.write_table(bin_store.store_name(self.sa_name, 'masses'), np.atleast_1d(masses), 'masses')
+		write_meta(self.sa_name, size)
+
+class BinCatalog(object):
+	'''
+	Bin table for a run in progress. Binaries are found in the live simulation at each output time 
+	and appended to tables in the same format as those written by BinAnalysis (_bins.csv, _times and 
+	_masses), so BinAnalysis(sa_name) can load them without replaying the archive.
+
+	append -- Continue the tables of a run restarted from sim (e.g. from a checkpoint): entries 
+	from sim.t on are dropped, and new ones are added after the rest.
+	'''
+	def __init__(self, sa_name, sim, append=False):
+		self.sa_name=sa_name
+		if append:
+			bins=np.genfromtxt(sa_name.replace('.bin', '_bins.csv'), delimiter=',').reshape([-1, 9])
+			ts=np.atleast_1d(np.genfromtxt(sa_name.replace('.bin', '_times')))
+			self.fbins=open(sa_name.replace('.bin', '_bins.csv'), 'w')
+			self.ftimes=open(sa_name.replace('.bin', '_times'), 'w')
+			np.savetxt(self.fbins, bins[bins[:,0]<sim.t], delimiter=',')
+			np.savetxt(self.ftimes, ts[ts<sim.t])
+		else:
+			np.savetxt(sa_name.replace('.bin', '_masses'), [pp.m for pp in sim.particles[1:]])
+			self.fbins=open(sa_name.replace('.bin', '_bins.csv'), 'w')
+			self.ftimes=open(sa_name.replace('.bin', '_times'), 'w')
+		self.nlist=NeighborList()
+
+	def add(self, sim):
+		'''
+		Find the binaries in sim and append them to the catalog.
+		'''
+		bins=bin_find_sim(sim, nlist=self.nlist)
+		if len(bins)>0:
+			np.savetxt(self.fbins, bins, delimiter=',')
+		np.savetxt(self.ftimes, [sim.t])
+		self.fbins.flush()
+		self.ftimes.flush()
+
+	def close(self):
+		self.fbins.close()
+		self.ftimes.close()
+		##Mark the tables as up to date with the archive (if the run is writing one).
+		if os.path.exists(self.sa_name):
+			write_meta(self.sa_name, os.path.getsize(self.sa_name))
+
+def pair_key(i1, i2):
+	'''
+	Canonical int64 key for the (unordered) pairs of stars i1, i2: min(i1,i2)*2^32+max(i1,i2).
+	'''
+	i1=np.asarray(i1, dtype=np.int64)
+	i2=np.asarray(i2, dtype=np.int64)
+	return (np.minimum(i1, i2)<<32) | np.maximum(i1, i2)
+
+def key_pair(keys):
+	'''
+	Inverse of pair_key: the stars (i1<i2) in each pair.
+	'''
+	keys=np.asarray(keys, dtype=np.int64)
+	return keys>>32, keys & 0xffffffff
+
+def csr_index(labels, n, rows=None):
+	'''
+	Group table rows by an integer label in [0,n): the rows with label l are 
+	rows[ptr[l]:ptr[l+1]], in table order. By default row i has label labels[i].
+	'''
+	labels=np.asarray(labels, dtype=np.int64)
+	if rows is None:
+		rows=np.arange(len(labels))
+	order=np.lexsort((rows, labels))
+	ptr=np.zeros(n+1, dtype=np.int64)
+	ptr[1:]=np.cumsum(np.bincount(labels, minlength=n))
+	return ptr, rows[order]
+
+def snap_index(ts, times, rtol=1.0e-12):
+	'''
+	Index of the snapshot in ts (the first one if several have the same time) for each of times; 
+	-1 if there is no snapshot within rtol (relative) of the time.
+	'''
+	ts=np.atleast_1d(ts)
+	times=np.atleast_1d(times)
+	if len(ts)==0:
+		return -np.ones(len(times), dtype=np.int64)
+	tu,first=np.unique(ts, return_index=True)
+	jj=np.searchsorted(tu, times)
+	lo=np.clip(jj-1, 0, len(tu)-1)
+	hi=np.clip(jj, 0, len(tu)-1)
+	near=np.where(np.abs(tu[hi]-times)<np.abs(tu[lo]-times), hi, lo)
+	return np.where(np.abs(tu[near]-times)<=rtol*np.abs(tu[near]), first[near], -1)
 
 def p_dist(loc, idx):
 	t,name=loc
@@ -336,71 +768,230 @@ def lag_plot(sa_name, i1, i2, extras=[], name='',  idx_min=0, idx_max=None, lim=
 		
 
 class BinAnalysis(object):
-	def __init__(self, sa_name):
+	def __init__(self, sa_name, nproc=1, update=True, interval=0.2*np.pi):
 		'''
 		Getting properties of all of the binaries in a rebound simulation run.
+
+		nproc -- Number of processes to use if the bin table has to be generated.
+		update -- If the archive has grown since the bin table was generated (e.g. 
+		after restart.py), analyze the new snapshots and append them to the table.
+		interval -- Spacing of the snapshots to analyze (see snapshot_index); None to analyze 
+		all of them.
 		'''
 		self.sa_name=sa_name
+		self.nproc=nproc
+		self.interval=interval
 		#sa=rebound.SimulationArchive(sa_name)
 		#self.m0=sa[0].particles[0].m
 		# self.tords=np.arange(0., 500.1*2.*np.pi, 0.2*np.pi)
 		
 		try:
-			self.ts= np.genfromtxt(sa_name.replace('.bin', '_times'))
-			self.bins=np.genfromtxt(sa_name.replace('.bin','_bins.csv'), delimiter=',')
-			self.masses=np.genfromtxt(sa_name.replace('.bin', '_masses'))
-		except:
-			print "Generating bin table"
-			self.__bin_init__()
-		self.delta_t=np.diff(self.ts)[0]
+			self.__load_store__()
+		except (IOError, OSError, ValueError):
+			##Runs analyzed before the binary store existed: fall back to the text tables.
+			try:
+				self.ts= np.genfromtxt(sa_name.replace('.bin', '_times'))
+				bins=np.genfromtxt(sa_name.replace('.bin','_bins.csv'), delimiter=',')
+				self.masses=np.genfromtxt(sa_name.replace('.bin', '_masses'))
+			except:
+				print "Generating bin table"
+				self.__bin_init__()
+			else:
+				self.rec=bin_store.to_records(bins.reshape([-1, 9]), 'bins')
+				self.__save_store__()
+				if update and os.path.exists(sa_name):
+					self.__bin_update__()
+		else:
+			if update and os.path.exists(sa_name):
+				self.__bin_update__()
+		##Distinct snapshot times; tables from before snapshot_index may list some snapshots twice.
+		self.ts_u=np.unique(self.ts)
+		self.delta_t=np.median(np.diff(self.ts_u)) if len(self.ts_u)>1 else 0.
 		#self.locs = [[tt, sa_name] for tt in self.ts]
 
-		self.pairs_arr=self.bins[:,[1,2]].astype(int)
-		self.times_arr=self.bins[:,0]
-		self.pairs=np.array([{int(self.bins[i,1]),int(self.bins[i,2])} for i in range(len(self.bins))])
-		tmp,idx=np.unique(self.pairs.astype(str), return_index=True)
-		self.pairs_u=self.pairs[idx]
-		##Filter pairs by mass
-		mh_thres=np.median(self.masses)
-		pairs_u_arr=np.array([list(pp) for pp in self.pairs_u])
-		filt=np.array([((self.masses[pp[0]-1]<=mh_thres) & (self.masses[pp[1]-1]<=mh_thres)) for pp in pairs_u_arr])
-		pairs_u_arr_light=pairs_u_arr[filt]
-		self.pairs_u_light=np.array([set(pp) for pp in pairs_u_arr_light])
-		filt=np.array([((self.masses[pp[0]-1]>mh_thres) & (self.masses[pp[1]-1]>mh_thres)) for pp in pairs_u_arr])
-		pairs_u_arr_heavy=pairs_u_arr[filt]
-		self.pairs_u_heavy=np.array([set(pp) for pp in pairs_u_arr_heavy])
-		filt=np.array([((self.masses[pp[0]-1]>mh_thres) ^ (self.masses[pp[1]-1]>mh_thres)) for pp in pairs_u_arr])
-		pairs_u_arr_mixed=pairs_u_arr[filt]
-		self.pairs_u_mixed=np.array([set(pp) for pp in pairs_u_arr_mixed])
+		self.pairs_arr=np.column_stack([self.rec['i1'], self.rec['i2']]).astype(int)
+		self.times_arr=self.rec['t']
+		##Index of the snapshot (in self.ts_u) for each row of the bin table
+		self.slots=snap_index(self.ts_u, self.times_arr)
+		if len(self.ts_u)<len(np.atleast_1d(self.ts)):
+			##Rows are repeated for snapshots listed twice; keep one copy.
+			keys=pair_key(self.pairs_arr[:,0], self.pairs_arr[:,1])
+			order=np.lexsort((keys, self.slots))
+			keep=np.ones(len(order), dtype=bool)
+			keep[order[1:]]=(self.slots[order[1:]]!=self.slots[order[:-1]]) | (keys[order[1:]]!=keys[order[:-1]])
+			self.rec=self.rec[keep]
+			self.pairs_arr=self.pairs_arr[keep]
+			self.times_arr=self.times_arr[keep]
+			self.slots=self.slots[keep]
+		self.__index_pairs__()
+
+	@property
+	def bins(self):
+		'''
+		Bin table as a float array with one column per field (as in _bins.csv). This is a copy; the
+		table itself (self.rec) is memory mapped from the binary store.
+		'''
+		return bin_store.from_records(self.rec).reshape([-1, 9])
 
+	def __index_pairs__(self):
+		'''
+		Canonical integer keys for the pair in each row of the bin table, and indices from 
+		pair and from star to the rows of the table (see csr_index).
+
+		pair_keys -- Key (see pair_key) for each row.
+		pair_inv -- Index of the key of each row in keys_u.
+		keys_u -- Sorted unique keys; rows of keys_u[j] are pair_rows[pair_ptr[j]:pair_ptr[j+1]].
+		Rows involving star ns are star_rows[star_ptr[ns]:star_ptr[ns+1]].
+		keys_u_light/heavy/mixed -- Keys of pairs where both/neither/one of the stars have 
+		masses at or below the median.
+		pairs_u(_light/_heavy/_mixed) -- The same pairs as sets of star indices.
+		'''
+		self.pair_keys=pair_key(self.pairs_arr[:,0], self.pairs_arr[:,1])
+		self.keys_u,self.pair_inv=np.unique(self.pair_keys, return_inverse=True)
+		self.pair_ptr,self.pair_rows=csr_index(self.pair_inv, len(self.keys_u))
+		nstars=max(len(np.atleast_1d(self.masses))+1, np.max(self.pairs_arr)+1 if len(self.pairs_arr)>0 else 0)
+		rows=np.arange(len(self.pairs_arr))
+		self.star_ptr,self.star_rows=csr_index(np.concatenate([self.pairs_arr[:,0], self.pairs_arr[:,1]]),\
+			nstars, np.concatenate([rows, rows]))
 
-		# pair_u_arr_heavy=[self.masses[pp[0]>1.0e-4] & self.masses[pp[1]>1.0e-4] for pp in pairs_u_arr]
-		# self.pairs_u_heavy=np.array([set(pp) for pp in pair_u_arr_heavy])
+		##Filter pairs by mass
+		mh_thres=np.median(self.masses)
+		i1,i2=key_pair(self.keys_u)
+		heavy1=self.masses[i1-1]>mh_thres
+		heavy2=self.masses[i2-1]>mh_thres
+		self.keys_u_light=self.keys_u[~heavy1 & ~heavy2]
+		self.keys_u_heavy=self.keys_u[heavy1 & heavy2]
+		self.keys_u_mixed=self.keys_u[heavy1 ^ heavy2]
+		for extra in ['', '_light', '_heavy', '_mixed']:
+			i1,i2=key_pair(getattr(self, 'keys_u'+extra))
+			pairs_u=np.empty(len(i1), dtype=object)
+			pairs_u[:]=[{int(a), int(b)} for a,b in zip(i1, i2)]
+			setattr(self, 'pairs_u'+extra, pairs_u)
+
+	def pair_rows_of(self, key):
+		'''
+		Rows of the bin table (in time order) for the pair with the given key.
+		'''
+		jj=np.searchsorted(self.keys_u, key)
+		if jj==len(self.keys_u) or self.keys_u[jj]!=key:
+			return np.empty(0, dtype=np.int64)
+		return self.pair_rows[self.pair_ptr[jj]:self.pair_ptr[jj+1]]
 
+	def star_rows_of(self, ns):
+		'''
+		Rows of the bin table (in time order) where star ns is in a binary.
+		'''
+		if ns<0 or ns>=len(self.star_ptr)-1:
+			return np.empty(0, dtype=np.int64)
+		return self.star_rows[self.star_ptr[ns]:self.star_ptr[ns+1]]
 
 	def __bin_init__(self):
-		sa = rebound.SimulationArchive(self.sa_name)
-		##Range of snapshots to get -- sometime bin files contain too many densely spaced snapshots.
-		##Make sure we get get data from only every 0.1 orbits...Replace the last number with snapshot interval
-		##read directly from the simulation.
-		self.tords=np.arange(0, sa[-1].t+0.01*np.pi, 0.2*np.pi)
-		self.tords[0]=2.0e-15
-
-		sims= sa.getSimulations(self.tords)
-		self.ts=[sim.t for sim in sims] 
-		np.savetxt(self.sa_name.replace('.bin', '_times'), self.ts)
-		locs = [[tt, self.sa_name] for tt in self.ts]
-		#pool = rebound.InterruptiblePool(processes=3)
-		bins = map(bin_find,locs)
-		#bins=np.array(bins)
-		filt=np.array([len(bins[i])>0 for i in range(len(bins))])
-		bins2=np.array(bins)[filt]
-		bins2=np.concatenate(bins2)
-		self.bins=bins2
-
-		np.savetxt(self.sa_name.replace('.bin','_bins.csv'), self.bins,delimiter=',')
-		self.masses = np.array([pp.m for pp in sa[0].particles[1:]])
-		np.savetxt(self.sa_name.replace('.bin', '_masses'), self.masses)
+		'''
+		Generate the bin table. Snapshots are analyzed one at a time and their binaries are written 
+		out as they are found, so memory use does not grow with the length of the run.
+		'''
+		##Size of the archive we are about to analyze (it may still be growing).
+		size=os.path.getsize(self.sa_name)
+		blobs,ts,cadence=snapshot_slots(snapshot_times(self.sa_name)[0], self.interval)
+		sim = rebound.Simulation(self.sa_name, snapshot=0)
+		masses = np.array([pp.m for pp in sim.particles[1:]])
+		del sim
+
+		##The tables only replace the old ones once every snapshot has been analyzed (see BinTables).
+		tables=BinTables(self.sa_name)
+		self.__append_bins__(tables, blobs)
+		tables.close(ts, masses, size)
+		self.ts,self.masses=ts,masses
+		self.rec=bin_store.read_table(bin_store.store_name(self.sa_name, 'bins'), 'bins')
+
+	def __bin_update__(self):
+		'''
+		Analyze only the snapshots that were appended to the archive since the bin 
+		table was generated, and append them to the cached tables. Everything is 
+		regenerated if the part of the archive that was already analyzed has changed.
+		'''
+		size=os.path.getsize(self.sa_name)
+		##Tables from before we kept track of the archive (no meta data) are assumed to match the archive.
+		if size==read_meta(self.sa_name)[0]:
+			return
+		blobs,ts,cadence=snapshot_slots(snapshot_times(self.sa_name)[0], self.interval)
+		self.ts=np.atleast_1d(self.ts)
+		nn=tables_cover(self.sa_name, self.ts, ts, size)
+		if nn is None:
+			print "Archive changed, regenerating bin table"
+			self.__bin_init__()
+			return
+		ts_new=ts[nn:]
+		if len(ts_new)>0:
+			print "Adding {0} snapshots to bin table".format(len(ts_new))
+			##BinTables rewrites the store we have memory mapped.
+			self.rec=None
+			tables=BinTables(self.sa_name, t_last=self.ts[-1])
+			self.__append_bins__(tables, blobs[nn:])
+			self.ts=np.concatenate([self.ts, ts_new])
+			tables.close(self.ts, self.masses, size)
+			self.rec=bin_store.read_table(bin_store.store_name(self.sa_name, 'bins'), 'bins')
+		else:
+			write_meta(self.sa_name, size)
+
+	def __load_store__(self):
+		'''
+		Load the tables from the binary store. Raises IOError if the store is missing or 
+		older than the text tables (e.g. they were regenerated by an older version of this code), 
+		and ValueError if it has the wrong format.
+		'''
+		for table in ['bins', 'times', 'masses']:
+			fname=bin_store.store_name(self.sa_name, table)
+			text=self.sa_name.replace('.bin', {'bins':'_bins.csv', 'times':'_times', 'masses':'_masses'}[table])
+			if os.path.exists(text) and os.path.getmtime(text)>os.path.getmtime(fname):
+				raise IOError('{0} is older than {1}'.format(fname, text))
+		self.rec=bin_store.read_table(bin_store.store_name(self.sa_name, 'bins'), 'bins')
+		self.ts=bin_store.from_records(bin_store.read_table(bin_store.store_name(self.sa_name, 'times'), 'times'))
+		self.masses=bin_store.from_records(bin_store.read_table(bin_store.store_name(self.sa_name, 'masses'), 'masses'))
+
+	def __save_store__(self):
+		'''
+		Write the tables to the binary store.
+		'''
+		bin_store.write_table(bin_store.store_name(self.sa_name, 'bins'), self.rec, 'bins')
+		bin_store.write_table(bin_store.store_name(self.sa_name, 'times'), np.atleast_1d(self.ts), 'times')
+		bin_store.write_table(bin_store.store_name(self.sa_name, 'masses'), np.atleast_1d(self.masses), 'masses')
+
+	def __bin_find_times__(self, blobs):
+		'''
+		Bin tables for the snapshots with blob indices blobs (see snapshot_index), one snapshot at a 
+		time and in order.
+		'''
+		if self.nproc<=1:
+			for bins in bin_find_iter(self.sa_name, blobs):
+				yield bins
+			return
+		##Each process gets a contiguous chunk of snapshots; pool.imap returns the chunks in order, 
+		##as they are finished.
+		nchunk=int(max(1, min(BIN_CHUNK, np.ceil(len(blobs)/float(self.nproc)))))
+		locs = [[blobs[ii:ii+nchunk], self.sa_name] for ii in range(0, len(blobs), nchunk)]
+		pool = rebound.InterruptiblePool(processes=self.nproc)
+		try:
+			for chunk in pool.imap(bin_find_chunk, locs):
+				for bins in chunk:
+					yield bins
+			pool.close()
+		finally:
+			##Stop the workers if the caller fails or stops early, as well.
+			pool.terminate()
+			pool.join()
+
+	def __append_bins__(self, tables, blobs):
+		'''
+		Find the binaries in the snapshots with blob indices blobs, and add them to tables (a BinTables) 
+		as they are found.
+		'''
+		found=self.__bin_find_times__(blobs)
+		try:
+			for bins in found:
+				tables.add(bins)
+		finally:
+			found.close()
 
 
 	def sigs(self, ii):
@@ -412,70 +1003,110 @@ class BinAnalysis(object):
 		vh=rh*omega
 		return ((4.*np.pi)/3.)*rh**2.*(vh/self.sigs(ii)[2])**4.
 
-	def exotica(self):
+	def exotica(self, verbose=True, save=False):
 		'''
 		Identifying triples and exchange interactions.
-		'''
-		for ns in range(np.min(self.pairs_arr), np.max(self.pairs_arr)+1):
-			last=[]
-			tlast=0.
-			for tt in np.unique(self.times_arr):
-				filt=(self.times_arr==tt)
-				filt2=[(ns in pp) for pp in self.pairs[filt]]
-				tmp=self.pairs[filt][filt2]
 
-				if len(tmp)>1:
-					print "star {0}, {1} bound stars!, tt={2}".format(ns, len(tmp)+1, tt/(2.*np.pi))
-				elif (len(tmp)==1) and (len(last)==1) and (list(tmp)!=list(last)) and (tt-tlast<1.5*self.delta_t):
-					print "star {0}, exchange!, tt={1}, {2}->{3}, {4}".format(ns, tt/(2.*np.pi), last, tmp, (tt-tlast)/self.delta_t)
-				last=np.copy(tmp)
-				tlast=tt
+		Returns a table of events (see bin_store.SCHEMAS['events']) sorted by star and time:
+		kind=TRIPLE -- star is bound to nbound-1 other stars at time t.
+		kind=EXCHANGE -- star's only partner changed from old to new between consecutive snapshots 
+		(gap is the time between them in units of delta_t).
 
-	def num_bins(self):
+		verbose -- Print the events.
+		save -- Save the table to the binary store (see bin_store.store_name(sa_name, 'events')).
 		'''
-		Number of binaries for each snapshot of the simulation.
+		tu=self.ts_u
+		##One entry for each star in each row of the bin table, sorted by star and then time.
+		nstars=len(self.star_ptr)-1
+		star=np.repeat(np.arange(nstars), np.diff(self.star_ptr))
+		rows=self.star_rows
+		partner=np.where(self.pairs_arr[rows,0]==star, self.pairs_arr[rows,1], self.pairs_arr[rows,0])
+		slot=self.slots[rows]
+		##Group the entries by star and snapshot.
+		new_grp=np.ones(len(rows), dtype=bool)
+		new_grp[1:]=(star[1:]!=star[:-1]) | (slot[1:]!=slot[:-1])
+		first=np.where(new_grp)[0]
+		gstar=star[first]
+		gslot=slot[first]
+		gcount=np.diff(np.append(first, len(rows)))
+		gpartner=partner[first]
+
+		trip=gcount>1
+		##Star was in exactly one binary in the previous snapshot of the table as well, with a different partner.
+		exch=np.zeros(len(first), dtype=bool)
+		exch[1:]=(gstar[1:]==gstar[:-1]) & (gslot[1:]==gslot[:-1]+1) & (gcount[1:]==1) & (gcount[:-1]==1) &\
+			(gpartner[1:]!=gpartner[:-1])
+		dt=np.zeros(len(first))
+		dt[1:]=tu[gslot[1:]]-tu[np.maximum(gslot[1:]-1, 0)]
+		exch&=dt<1.5*self.delta_t
+		old=np.full(len(first), -1, dtype=np.int64)
+		old[1:]=gpartner[:-1]
+		grow=rows[first]
+		old_row=np.roll(grow, 1)
+
+		sel=np.where(trip | exch)[0]
+		events=np.empty(len(sel), dtype=bin_store.SCHEMAS['events'])
+		events['t']=tu[gslot[sel]]
+		events['star']=gstar[sel]
+		events['kind']=np.where(trip[sel], TRIPLE, EXCHANGE)
+		events['nbound']=np.where(trip[sel], gcount[sel]+1, 2)
+		events['old']=np.where(trip[sel], -1, old[sel])
+		events['new']=np.where(trip[sel], -1, gpartner[sel])
+		with np.errstate(divide='ignore', invalid='ignore'):
+			events['gap']=np.where(trip[sel], 0., dt[sel]/self.delta_t)
+
+		if verbose:
+			for ev,rr,rr_old in zip(events, grow[sel], old_row[sel]):
+				if ev['kind']==TRIPLE:
+					print "star {0}, {1} bound stars!, tt={2}".format(ev['star'], ev['nbound'], ev['t']/(2.*np.pi))
+				else:
+					print "star {0}, exchange!, tt={1}, {2}->{3}, {4}".format(ev['star'], ev['t']/(2.*np.pi),\
+						np.array([set(self.pairs_arr[rr_old].tolist())]), np.array([set(self.pairs_arr[rr].tolist())]), ev['gap'])
+		if save:
+			bin_store.write_table(bin_store.store_name(self.sa_name, 'events'), events, 'events')
+		return events
+
+	def num_bins(self, extra='', min_life=None, norm=True, total=False):
 		'''
-		num_bins=[len(self.times_arr[np.isclose(self.times_arr,tt, atol=0., rtol=1.0e-12)]) for tt in self.ts]
-		return num_bins
+		Number of binaries for each snapshot of the simulation.
 
-	def num_bins_filt(self):
+		extra -- Only count pairs in this mass class ('_light', '_heavy' or '_mixed'; see __index_pairs__).
+		min_life -- Only count pairs that survive for longer than min_life (see bin_times for norm and total).
+		'''
+		filt=self.slots>=0
+		if extra:
+			filt&=np.in1d(self.pair_keys, getattr(self, 'keys_u'+extra))
+		if min_life is not None:
+			filt&=(self.bin_times(norm=norm, total=total)>min_life)[self.pair_inv]
+		counts=np.bincount(self.slots[filt], minlength=len(self.ts_u))
+		##Snapshots listed twice in self.ts get the same count
+		return counts[np.searchsorted(self.ts_u, self.ts)]
+
+	def num_bins_filt(self, extra=''):
 		'''
 		Count number of binaries but only include binaries that complete at 
 		least one orbit...
 		'''
-		times=self.bin_times()
-		filt=times>1.		
-		bins2=self.bins[filt]
-		times_arr=bins2[:,0]
-
-		num_bins=[len(times_arr[np.isclose(times_arr,tt, atol=0., rtol=1.0e-12)]) for tt in self.ts]
-		return num_bins
+		return self.num_bins(extra=extra, min_life=1.)
 
 	def bin_times(self, norm=True, extra='', total=False):
-		pairs=self.pairs
-		pairs_u=getattr(self, 'pairs_u'+extra)
+		keys_u=getattr(self, 'keys_u'+extra)
 
-		t_survs=np.zeros(len(pairs_u))
+		t_survs=np.zeros(len(keys_u))
 		##For each binary identify how long it survives
-		for ii,pp in enumerate(pairs_u):
+		for ii,kk in enumerate(keys_u):
 			##Identify all times where each binary pair exists.
-			t_bin=self.times_arr[pairs==pp]
+			rows=self.pair_rows_of(kk)
+			t_bin=self.times_arr[rows]
 			t_surv=t_bin[-1]-t_bin[0]
 			#Index of one of the stars in the pair
-			idx=self.pairs_arr[pairs==pp][0,1]
-			idx2=self.pairs_arr[pairs==pp][0,0]
-
-			##Edge case: Binary splits up and forms again. See if the binary has skipped any snapshots.
-			##Note that snapshots may not be exactly evenly spaced in time...
-			# if np.any(lens>1):
-			# 	print self.sa_name,np.array([self.ts[np.where(np.abs(self.ts-t_bin[jj])/t_bin[jj]<1.0e-12)[0]] for jj in range(len(t_bin))])[lens>1]
-			diffs=np.diff([np.where(np.abs(self.ts-t_bin[jj])/t_bin[jj]<1.0e-12)[0][0] for jj in range(len(t_bin))])
-			## This second line is necessary in cases for which we have duplicate snapshots.
-			diffs1=np.diff([np.where(np.abs(self.ts-t_bin[jj])/t_bin[jj]<1.0e-12)[0][-1] for jj in range(len(t_bin))])
-
+			idx2,idx=self.pairs_arr[rows[0]]
 
-			if np.any((diffs>1.01) & (diffs1>1.01)):
-				tmp=np.split(t_bin, (np.where((diffs>1.01) & (diffs1>1.01)))[0]+1)
+			##Edge case: Binary splits up and forms again. See if the binary has skipped any snapshots
+			##(slots index the distinct snapshot times, so duplicate snapshots do not matter).
+			breaks=np.where(np.diff(self.slots[rows])>1)[0]+1
+			if len(breaks)>0:
+				tmp=np.split(t_bin, breaks)
 				tmp2=[tmp[i][-1]-tmp[i][0] for i in range(len(tmp))]
 				order=np.argsort(tmp2)
 				# t_bin=tmp[order[-1]]
@@ -489,7 +1120,7 @@ class BinAnalysis(object):
 			if norm:
 				m1=self.masses[idx-1]
 				m2=self.masses[idx2-1]
-				t_orb = 2.*np.pi*np.min((self.bins[self.pairs==pp][:,4]**3./(m1+m2))**0.5)
+				t_orb = 2.*np.pi*np.min((self.rec['a_bin'][rows]**3./(m1+m2))**0.5)
 				t_surv=t_surv/t_orb 
 			t_survs[ii]=t_surv
 
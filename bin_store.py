@@ -0,0 +1,119 @@
+'''
+Compact binary store for the tables produced by BinAnalysis (binaries, snapshot times,
+stellar masses and exotica events), and for the per run summaries used by ensemble.py.
+
+Each table lives in its own file: a fixed size ASCII header followed by the packed records.
+The header holds a magic string, the format version, the table name and the record layout
+(numpy dtype), e.g.
+
+BINSTORE 1 bins [('t', '<f8'), ('i1', '<i4'), ...]
+
+The number of records follows from the file size, so rows can be appended without touching
+the header. Tables are read back with np.memmap.
+'''
+import os
+import numpy as np
+
+MAGIC='BINSTORE'
+VERSION=1
+HEADER_SIZE=512
+
+##Record layouts of the tables written by BinAnalysis
+SCHEMAS={
+	'bins':[('t', '<f8'), ('i1', '<i4'), ('i2', '<i4'), ('sep', '<f8'), ('a_bin', '<f8'), ('a_rh', '<f8'),\
+		('e_bin', '<f8'), ('rh', '<f8'), ('vh', '<f8')],
+	'times':[('t', '<f8')],
+	'masses':[('m', '<f8')],
+	##Triples and exchanges found by BinAnalysis.exotica
+	'events':[('t', '<f8'), ('star', '<i4'), ('kind', '<i4'), ('nbound', '<i4'), ('old', '<i4'), ('new', '<i4'), ('gap', '<f8')],
+	##Number of binaries and z velocity dispersion in each mass class at each snapshot (see ensemble.run_summary)
+	'summary':[('t', '<f8'), ('n_all', '<i4'), ('n_light', '<i4'), ('n_heavy', '<i4'), ('n_mixed', '<i4'),\
+		('sig_all', '<f8'), ('sig_light', '<f8'), ('sig_heavy', '<f8'), ('sig_mixed', '<f8')]
+	}
+
+
+def store_name(sa_name, table):
+	'''
+	File name of a table for the archive sa_name, e.g. archive_bins.bst
+	'''
+	return sa_name.replace('.bin', '_{0}.bst'.format(table))
+
+
+def to_records(arr, table):
+	'''
+	Convert a 2d float array (one column per field, as in _bins.csv), 1d array or
+	record array to a record array for table.
+	'''
+	dtype=np.dtype(SCHEMAS[table])
+	arr=np.asarray(arr)
+	if arr.dtype.names:
+		return arr.astype(dtype)
+	if arr.ndim==1:
+		arr=arr.reshape([-1, 1])
+	rec=np.empty(len(arr), dtype=dtype)
+	for ii,nn in enumerate(dtype.names):
+		rec[nn]=arr[:,ii]
+	return rec
+
+
+def from_records(rec):
+	'''
+	Inverse of to_records: float array with one column per field (1d for single field tables).
+	This copies the data; index memory mapped tables by field (rec['t']) to avoid the copy.
+	'''
+	if len(rec.dtype.names)==1:
+		return np.array(rec[rec.dtype.names[0]], dtype=float)
+	return np.column_stack([rec[nn] for nn in rec.dtype.names]).astype(float)
+
+
+def write_table(fname, arr, table):
+	'''
+	Write arr (see to_records) to a new store file fname.
+	'''
+	header='{0} {1} {2} {3}'.format(MAGIC, VERSION, table, SCHEMAS[table])
+	if len(header)>=HEADER_SIZE:
+		raise ValueError('Schema for {0} too long for header'.format(table))
+	f=open(fname, 'wb')
+	f.write(header.ljust(HEADER_SIZE-1)+'\n')
+	to_records(arr, table).tofile(f)
+	f.close()
+
+
+def append_table(fname, arr, table):
+	'''
+	Append the rows in arr to the store file fname (created if it does not exist).
+	'''
+	if not os.path.exists(fname):
+		write_table(fname, arr, table)
+		return
+	read_header(fname, table)
+	f=open(fname, 'ab')
+	to_records(arr, table).tofile(f)
+	f.close()
+
+
+def read_header(fname, table):
+	'''
+	Check the header of a store file, and return the record dtype. Raises ValueError
+	if the file is not a store for table, or was written with a different format version
+	or schema.
+	'''
+	f=open(fname, 'rb')
+	header=f.read(HEADER_SIZE).split(None, 3)
+	f.close()
+	if len(header)<4 or header[0]!=MAGIC:
+		raise ValueError('{0} is not a binary table'.format(fname))
+	if int(header[1])!=VERSION or header[2]!=table or header[3].strip()!=str(SCHEMAS[table]):
+		raise ValueError('{0}: unsupported version or schema'.format(fname))
+	return np.dtype(SCHEMAS[table])
+
+
+def read_table(fname, table):
+	'''
+	Memory map the records in the store file fname.
+	'''
+	dtype=read_header(fname, table)
+	nrows=(os.path.getsize(fname)-HEADER_SIZE)//dtype.itemsize
+	if nrows==0:
+		return np.empty(0, dtype=dtype)
+	return np.memmap(fname, dtype=dtype, mode='r', offset=HEADER_SIZE, shape=(nrows,))
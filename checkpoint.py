@@ -0,0 +1,112 @@
+'''
+Checkpoints of a run in a single SimulationArchive file.
+
+Each checkpoint is appended to the archive as a snapshot (rebound stores it as a diff against
+the first snapshot), and a line "step t blob" is appended to a text index next to it
+(e.g. run_ckpt.bin -> run_ckpt_index), so that the latest checkpoint can be found without
+reading the archive. (Opening the archive only walks the field headers of the snapshots, and
+the retention policy keeps it short, so the snapshot is loaded by number rather than offset.)
+
+Old checkpoints are thinned out according to a retention policy: the last keep_last checkpoints
+are kept, as well as the first checkpoint in each interval of length keep_every. Dropping
+checkpoints rewrites the archive with the retained snapshots only.
+'''
+import os
+import warnings
+import numpy as np
+import rebound
+
+def index_name(fname):
+	'''
+	File name of the checkpoint index for the archive fname, e.g. run_ckpt_index
+	'''
+	return fname.replace('.bin', '_index')
+
+
+def read_index(fname):
+	'''
+	Checkpoint index of the archive fname: array with columns step, t, blob (one row per checkpoint).
+	'''
+	if not os.path.exists(index_name(fname)):
+		return np.empty([0, 3])
+	##Older indexes have a fourth column (byte offset of the snapshot)
+	return np.loadtxt(index_name(fname), ndmin=2)[:,:3]
+
+
+def retained(ts, keep_last, keep_every=None):
+	'''
+	Mask of the checkpoints (at times ts) kept by the retention policy: the last keep_last and the
+	first in each interval of length keep_every.
+	'''
+	ts=np.asarray(ts, dtype=float)
+	keep=np.zeros(len(ts), dtype=bool)
+	keep[-max(keep_last, 1):]=True
+	if keep_every:
+		keep[np.unique(np.floor(ts/keep_every+1.0e-9), return_index=True)[1]]=True
+	return keep
+
+
+def load_latest(fname):
+	'''
+	Simulation and output step of the latest checkpoint in the archive fname.
+	'''
+	idx=read_index(fname)
+	if len(idx)==0:
+		raise IOError('No checkpoints in {0}'.format(fname))
+	step,t,blob=idx[-1]
+	return rebound.Simulation(fname, snapshot=int(blob)), int(step)
+
+
+class CheckpointStream(object):
+	'''
+	Checkpoints of a run in the SimulationArchive fname.
+
+	keep_last -- Number of recent checkpoints to keep.
+	keep_every -- Also keep one checkpoint per keep_every time units (None to keep only the last ones).
+	append -- Add to an existing archive and index (e.g. after a restart) instead of starting a new one.
+	'''
+	def __init__(self, fname, keep_last=3, keep_every=None, append=False):
+		self.fname=fname
+		self.keep_last=keep_last
+		self.keep_every=keep_every
+		if not append:
+			for ff in [fname, index_name(fname)]:
+				if os.path.exists(ff):
+					os.remove(ff)
+		self.index=read_index(fname)
+
+	def save(self, sim, step):
+		'''
+		Append a checkpoint of sim at output step, and apply the retention policy.
+		'''
+		sim.simulationarchive_snapshot(self.fname)
+		self.index=np.vstack([self.index, [step, sim.t, len(self.index)]])
+		f=open(index_name(self.fname), 'a')
+		f.write('{0} {1:.16e} {2}\n'.format(step, sim.t, len(self.index)-1))
+		f.close()
+
+		keep=retained(self.index[:,1], self.keep_last, self.keep_every)
+		##Rewrite once there are keep_last checkpoints to drop, so the cost is amortized.
+		if np.sum(~keep)>=max(self.keep_last, 1):
+			self.__compact__(keep)
+
+	def __compact__(self, keep):
+		'''
+		Rewrite the archive and index with the checkpoints in keep only.
+		'''
+		tmp=self.fname+'.tmp'
+		if os.path.exists(tmp):
+			os.remove(tmp)
+		sa=rebound.SimulationArchive(self.fname)
+		index=[]
+		with warnings.catch_warnings():
+			##The snapshots are only copied, so the (collision) function pointers need not be set.
+			warnings.simplefilter('ignore', RuntimeWarning)
+			for step,t,blob in self.index[keep]:
+				sa[int(blob)].simulationarchive_snapshot(tmp)
+				index.append([step, t, len(index)])
+		del sa
+		self.index=np.array(index)
+		np.savetxt(index_name(tmp), self.index, fmt=['%d', '%.16e', '%d'])
+		os.rename(tmp, self.fname)
+		os.rename(index_name(tmp), index_name(self.fname))
@@ -0,0 +1,86 @@
+'''
+Initial conditions for the stellar disks set up by the config drivers (end_aleksey_config.py and
+end_aleksey_config_b.py). All of the stars in a component are drawn at once from a numpy
+RandomState (so runs can be reproduced from a seed), converted to Cartesian coordinates in
+bulk, and added to the simulation together.
+'''
+import ctypes
+import numpy as np
+import rebound
+from kepler import orbit_state
+
+
+def density(min1, max1, p, size=None, rng=np.random):
+	'''
+	Random numbers from a truncated power law PDF (~x^-p between min1 and max1).
+	'''
+	r=rng.random_sample(size)
+	if p==1:
+		return min1*np.exp(r*np.log(max1/min1))
+	else:
+		return (r*(max1**(1.-p)-min1**(1.-p))+min1**(1.-p))**(1./(1-p))
+
+
+def rotate_vec(angle, axis, vec):
+	'''
+	Rotate the vectors vec (shape (N, 3)) by angle around axis (Rodrigues' formula).
+	'''
+	axis,vec=[np.broadcast_to(xx, (len(angle), 3)) for xx in (axis, vec)]
+	ca=np.cos(angle)[:,None]
+	sa=np.sin(angle)[:,None]
+	return vec*ca+np.cross(axis, vec)*sa+axis*np.sum(axis*vec, axis=1)[:,None]*(1.-ca)
+
+
+def gen_disk(ang, size, rng=np.random):
+	'''
+	Angles (inc, Omega, omega) for a disk with nearly aligned eccentricity vectors. Start from
+	perfectly aligned e and j vectors and rotate them by small amounts: jhat by angle1 about the
+	major axis and angle2 about the minor axis, and ehat by angle2 about the minor axis and angle3
+	about jhat. The three angles are drawn from a normal distribution with standard deviation ang.
+	'''
+	ehat=np.array([1., 0., 0.])
+	jhat=np.array([0., 0., 1.])
+	bhat=np.cross(jhat, ehat)
+	angle1=rng.normal(0.0, ang, size)
+	angle2=rng.normal(0.0, ang, size)
+	angle3=rng.normal(0.0, ang, size)
+	jhat=rotate_vec(angle1, ehat, jhat)
+	jhat=rotate_vec(angle2, bhat, jhat)
+	ehat=rotate_vec(angle2, bhat, ehat)
+	ehat=rotate_vec(angle3, jhat, ehat)
+	n=np.cross(np.array([0., 0., 1.]), jhat)
+	n=n/np.sum(n*n, axis=1)[:,None]**0.5
+	Omega=np.arctan2(n[:,1], n[:,0])
+	omega=np.arccos(np.sum(n*ehat, axis=1))
+	omega[ehat[:,2]<0]=2.*np.pi-omega[ehat[:,2]<0]
+	inc=np.arccos(jhat[:,2])
+	return inc, Omega, omega
+
+
+def add_particles(sim, ms, xyz, vxyz):
+	'''
+	Add particles with masses ms, positions xyz and velocities vxyz to sim. The particle structures
+	are filled from the arrays, so the only per particle work is the call to reb_add.
+	'''
+	ps=(rebound.Particle*len(ms))()
+	fields=['x', 'y', 'z', 'vx', 'vy', 'vz', 'm']
+	dtype=np.dtype({'names':fields, 'formats':['f8']*len(fields),\
+		'offsets':[getattr(rebound.Particle, ff).offset for ff in fields], 'itemsize':ctypes.sizeof(rebound.Particle)})
+	arr=np.frombuffer(ps, dtype=dtype)
+	for kk in range(3):
+		arr[fields[kk]]=xyz[:,kk]
+		arr[fields[kk+3]]=vxyz[:,kk]
+	arr['m']=ms
+	for pp in ps:
+		sim.add(pp)
+
+
+def add_orbits(sim, ms, a, e, inc, Omega, omega, M):
+	'''
+	Add stars on orbits around sim.particles[0] with the given masses and orbital elements
+	(arrays, or scalars shared by all of the stars).
+	'''
+	primary=sim.particles[0]
+	ms=np.ones(len(np.atleast_1d(a)))*ms
+	xyz, vxyz=orbit_state(primary.m, ms, a, e, inc, Omega, omega, M, G=sim.G)
+	add_particles(sim, ms, xyz+np.array(primary.xyz), vxyz+np.array(primary.vxyz))
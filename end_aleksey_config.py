@@ -9,8 +9,9 @@ import numpy as np
 from collections import OrderedDict
 sys.path.append('/home/aleksey/rebound/')
 import rebound
-import random as rand
-from bin_analysis import bin_find_sim
+from bin_analysis import bin_strip, BinCatalog
+from disk_ic import density, add_orbits
+from tde import TDELog
 
 # Density function for semimajor axes (Hayden's implementation)
 # def density(min1, max1):
@@ -26,16 +27,6 @@ from bin_analysis import bin_find_sim
 #     r=np.random.random(1)[0]
 #     return (1./min1-r*(1./min1-1./max1))**-1.
 
-def density(min1, max1, p):
-	r=np.random.random(1)[0]
-	if p==1:
-		return min1*np.exp(r*np.log(max1/min1))
-	else:
-		return (r*(max1**(1.-p)-min1**(1.-p))+min1**(1.-p))**(1./(1-p))
-
-
-
-
 def heartbeat(sim):
 	print(sim.contents.dt, sim.contents.t)
 # sim is a pointer to the simulation object,
@@ -43,19 +34,6 @@ def heartbeat(sim):
 # See ctypes documentation for details.
 	# print(sim.contents.dt)
 
-def get_tde(sim, reb_coll):
-	orbits = sim[0].calculate_orbits(primary=sim[0].particles[0])
-	p1,p2 = reb_coll.p1, reb_coll.p2
-	idx, idx0 = max(p1, p2), min(p1, p2)
-	if idx0==0:
-		##idx decremented by 1 because there is no orbit 0
-		name=sim[0].simulationarchive_filename
-		f=open(name.replace('.bin', '_tde'), 'a+')
-		f.write('{0} {1} {2} {3} TDE!\n'.format(sim[0].t, orbits[idx-1].a, orbits[idx-1].e, idx))
-		f.close()
-
-	return 0
-
 def main():
 	parser=argparse.ArgumentParser(
 		description='Set up a rebound run')
@@ -77,7 +55,7 @@ def main():
 	config=ConfigParser.SafeConfigParser(defaults={'name': 'archive'.format(tag), 'N':'100', 'e':'0.7',
 		'gravity':'basic', 'integrator':'ias15', 'dt':'0', 'buffer':'1.', 'keep_bins':'False', \
 		'a_min':'1.', 'a_max':'2.', 'i_max':'5.', 'm':'5e-5', 'rt':'1.0e-4', 'coll':'line', 'pRun':'500', 'pOut':'0.2', 
-		'p':'2'}, dict_type=OrderedDict)
+		'p':'2', 'find_bins':'False', 'seed':''}, dict_type=OrderedDict)
 	# config.optionxform=str
 	config.read(config_file)
 
@@ -91,6 +69,10 @@ def main():
 	rt=config.getfloat('params', 'rt')
 	coll=config.get('params', 'coll')
 	buff=config.getfloat('params', 'buffer')
+	find_bins=config.getboolean('params', 'find_bins')
+	##Seed for the initial conditions (random if not set)
+	seed=config.get('params', 'seed')
+	rng=np.random.RandomState(int(seed) if seed else None)
 
 	print pRun, pOut, rt, coll
 	sections=config.sections()
@@ -125,14 +107,12 @@ def main():
 		p=config.getfloat(ss, 'p')
 		i_max=config.getfloat(ss, 'i_max')
 
-		M = np.zeros(N + 1)
-		for j in range(0, N + 1):
-			M[j] = rand.uniform(0, 2 * np.pi)
-
+		##Draw all of the stars in the component at once
+		M=rng.uniform(0., 2.*np.pi, N)
+		a0=density(a_min, a_max, p, N, rng)
+		inc=rng.uniform(0., i_max*np.pi/180.0, N)
 		N0=len(sim.particles)
-		for l in range(0,N): # Adds stars
-			a0=density(a_min, a_max, p)
-			sim.add(m = m, a = a0, e = e, inc=np.random.uniform(0, i_max * np.pi / 180.0), Omega = 0, omega = 0, M = M[l], primary=sim.particles[0])
+		add_orbits(sim, m, a0, e, inc, 0., 0., M)
 		nparts[ss]=(N0,N0+N-1)
 		#print N, m, e, a_min, a_max, i_max
 	
@@ -146,30 +126,18 @@ def main():
 	fen=open(name.replace('.bin', '_en'), 'a')
 	fen.write(sim.gravity+'_'+sim.integrator+'_'+'{0}'.format(sim.dt))
 	if not keep_bins:
-		##Integrate forward a small amount time to initialize accelerations.
 		sim.move_to_com()
-		sim.integrate(1.0e-15)
-		##Look for binaries
-		bins=bin_find_sim(sim)
-		bins=np.array(bins)
-		#print len(bins[:,[1,2]])
-		##Delete all the binaries that we found. The identification of binaries depends in part on the tidal field 
-		##of the star cluster, and this will change as we delete stars. So we repeat the binary 
-		##deletion process several times until there are none left.
-		while len(bins>0):
-			##Delete in reverse order (else the indices would become messed up)
-			to_del=(np.sort(np.unique(bins[:,1]))[::-1]).astype(int)
-			##print len(to_del)
-			for idx in to_del:
-				sim.remove(idx)
-			sim.integrate(sim.t+sim.t*1.0e-14)
-			bins=bin_find_sim(sim)
-			N0=1
-			for ss in sections:
-				del1=len(np.intersect1d(range(nparts[ss][0],nparts[ss][-1]+1), to_del))
-				tot1=nparts[ss][-1]-nparts[ss][0]+1
-				nparts[ss]=(N0, N0+tot1-del1-1)
-				N0=N0+tot1-del1
+		##Delete one member of each binary. The identification of binaries depends in part on the tidal field 
+		##of the star cluster, and this will change as we delete stars, so bin_strip repeats the search 
+		##until there are none left.
+		removed=bin_strip(sim)
+		##Index range of each component after the deletions
+		N0=1
+		for ss in sections:
+			del1=np.searchsorted(removed, nparts[ss][-1], 'right')-np.searchsorted(removed, nparts[ss][0])
+			tot1=nparts[ss][-1]-nparts[ss][0]+1
+			nparts[ss]=(N0, N0+tot1-del1-1)
+			N0=N0+tot1-del1
 
 	print len(sim.particles)
 	for ss in sections[::-1]:
@@ -181,7 +149,9 @@ def main():
 	ms=np.array([pp.m for pp in sim.particles[1:]])
 	print len(ms[ms<=np.median(ms)])
 	sim.collision=coll
-	sim.collision_resolve=get_tde
+	##TDEs are logged to name_tde (written out at each snapshot)
+	tdes=TDELog(name.replace('.bin', '_tde'))
+	sim.collision_resolve=tdes
 
 
 	##Set up simulation archive for output
@@ -191,7 +161,23 @@ def main():
 
 	en=sim.calculate_energy()
 	print rebound.__version__
+	if find_bins:
+		##Find binaries at each snapshot while the simulation runs, instead of replaying the archive afterwards.
+		catalog=BinCatalog(name, sim)
+		catalog.add(sim)
+	for tt in np.arange(np.pi*pOut, pRun*2*np.pi, np.pi*pOut):
+		##Stop on the step that crosses tt, i.e. the one where the snapshot is saved.
+		sim.integrate(tt, exact_finish_time=0)
+		tdes.flush()
+		if find_bins:
+			catalog.add(sim)
 	sim.integrate(pRun*2*np.pi)
+	tdes.close()
+	if find_bins:
+		##Snapshot saved at the end of the run (if the end falls on an output time)
+		if rebound.SimulationArchive(name).tmax==sim.t:
+			catalog.add(sim)
+		catalog.close()
 	en2=sim.calculate_energy()
 	#print abs(en2-en)/en
 	fen.write('_{0:2.3g}'.format(abs(en2-en)/en))
@@ -9,9 +9,12 @@ import numpy as np
 from collections import OrderedDict
 # sys.path.append('/usr/local/lib/python2.7/dist-packages/')
 import rebound
-import random as rand
-from bin_analysis import bin_find_sim
-import math
+from bin_analysis import bin_strip, sim_state, BinCatalog
+from kepler import orbit_elements
+from series_store import SeriesWriter
+from checkpoint import CheckpointStream, load_latest
+from disk_ic import density, gen_disk, add_orbits
+from tde import TDELog
 
 # Density function for semimajor axes (Hayden's implementation)
 # def density(min1, max1):
@@ -27,49 +30,30 @@ import math
 #     r=np.random.random(1)[0]
 #     return (1./min1-r*(1./min1-1./max1))**-1.
 
-def rotate_vec(angle,axis,vec):    
-	'''
-	Rotate vector vec by angle around axis
-	'''
-	vRot = vec*math.cos(angle) + np.cross(axis,vec)*math.sin(angle) + axis*np.dot(axis,vec)*(1 -math.cos(angle))
-	return vRot	
+##Quantities saved at each output: one value per star, and one value for the whole system
+STAR_FIELDS=['eccentricity', 'inclination', 'Omega', 'omega', 'semimajor_axis', 'mean_anomaly', 'x', 'y', 'z', 'vx', 'vy', 'vz']
+GLOBAL_FIELDS=['Energy', 'Angular_momentum_x', 'Angular_momentum_y', 'Angular_momentum_z']
+##Prefix of the text output file for each field (if different from the field name)
+TEXT_NAMES={'omega':'ommega'}
 
-def gen_disk(ang):
-	'''
-	This is from some old code that starts with perfectly aligned e and j vectors and then rotates them by a small amount
+def output_fields(sim, fields):
 	'''
-	ehat = np.array([1,0,0])
-	jhat = np.array([0,0,1])
-	bhat = np.cross(jhat,ehat)    # rotate jhat by angle1 over major axis and angle minor axis
-	# rotate ehat by angle2 over minor axis and angle3 about jhat
-	angle1 = np.random.normal(0.0, ang, 1)
-	angle2 = np.random.normal(0.0, ang, 1)
-	angle3 = np.random.normal(0.0, ang, 1)    
-	jhat = rotate_vec(angle1,ehat,jhat)
-	jhat = rotate_vec(angle2,bhat,jhat)
-	ehat = rotate_vec(angle2,bhat,ehat)
-	ehat = rotate_vec(angle3,jhat,ehat)    
-	n = np.cross(np.array([0,0,1]), jhat)
-	n = n / np.linalg.norm(n)   
-	Omega = math.atan2(n[1], n[0])
-	omega = math.acos(np.dot(n, ehat))
-	if ehat[2] < 0:
-		omega = 2*np.pi - omega    
-	inc=math.acos(jhat[2])    
-	return inc, Omega, omega
-
-
-def density(min1, max1, p):
+	Values of fields for the current state of sim (star j is sim.particles[j+1]).
 	'''
-	Generate a random from a truncated power law PDF with power law index p. 
-	min1 and max1
-
-	'''
-	r=np.random.random(1)[0]
-	if p==1:
-		return min1*np.exp(r*np.log(max1/min1))
-	else:
-		return (r*(max1**(1.-p)-min1**(1.-p))+min1**(1.-p))**(1./(1-p))
+	##Kepler elements of all the stars at once
+	xyz,vxyz,ms=sim_state(sim)
+	orbits=orbit_elements(xyz, vxyz, ms, G=sim.G)
+	vals={'eccentricity':orbits['e'], 'inclination':orbits['inc'], 'Omega':orbits['Omega'], 'omega':orbits['omega'],\
+		'semimajor_axis':orbits['a'], 'mean_anomaly':orbits['M']}
+	for kk,ff in enumerate(['x', 'y', 'z']):
+		vals[ff]=xyz[1:,kk]
+		vals['v'+ff]=vxyz[1:,kk]
+	##Energy and angular momentum are O(N^2) and O(N); only compute them if needed.
+	if 'Energy' in fields:
+		vals['Energy']=sim.calculate_energy()
+	if set(fields) & set(GLOBAL_FIELDS[1:]):
+		vals['Angular_momentum_x'],vals['Angular_momentum_y'],vals['Angular_momentum_z']=sim.calculate_angular_momentum()
+	return dict([(ff, vals[ff]) for ff in fields])
 
 def heartbeat(sim):
 	print(sim.contents.dt, sim.contents.t)
@@ -78,59 +62,10 @@ def heartbeat(sim):
 # See ctypes documentation for details.
 	# print(sim.contents.dt)
 
-def get_tde(sim, reb_coll):
-	orbits = sim[0].calculate_orbits(primary=sim[0].particles[0])
-	p1,p2 = reb_coll.p1, reb_coll.p2
-	idx, idx0 = max(p1, p2), min(p1, p2)
-	if idx0==0:
-		##idx decremented by 1 because there is no orbit 0
-		name=sim[0].simulationarchive_filename
-		f=open(name.replace('.bin', '_tde'), 'a+')
-		f.write('{0} {1} {2} {3} TDE!\n'.format(sim[0].t, orbits[idx-1].a, orbits[idx-1].e, idx))
-		f.close()
-
-	return 0
-
-def main():
-	parser=argparse.ArgumentParser(
-		description='Set up a rebound run')
-	parser.add_argument('--config', nargs=1, default='config',
-		help='File containing simulation parameters')
-	# parser.add_argument('--keep_bins', action='store_true',
-	# 	help="Don't delete bins from simulation")
-
-
-	##Parsing command line arguments.
-	args=parser.parse_args()
-	config_file=args.config
-	##Unique tag for output file.
-	tag=str(uuid.uuid4())
-
-	##Default stellar parameters 
-	config=ConfigParser.SafeConfigParser(defaults={'name': 'archive'.format(tag), 'N':'100', 'e':'0.7',
-		'gravity':'basic', 'integrator':'ias15', 'dt':'0', \
-		'a_min':'1.', 'a_max':'2.', 'ang':'2.', 'm':'5e-5', 'keep_bins':'False', 'rt':'1.0e-4', 'coll':'line', 'pRun':'500', 'pOut':'10', 
-		'p':'1', 'pSave':'50'}, dict_type=OrderedDict)
-	# config.optionxform=str
-	config.read(config_file)
-
-	##Name of our put file 
-	# name=config.get('params', 'name')
-	# name=name+"_"+tag
-	##Number of orbits to run for.
-	pRun=config.getint('params', 'pRun')
-	##Number of times per orbit to save data.
-	pOut=config.getint('params', 'pOut')
-	##Number of times to save data per simulation
-	pSave=config.getint('params', 'pSave')
-	times = np.linspace(0, pRun, pRun*pOut+1)
-	print times
-
-	keep_bins=config.getboolean('params', 'keep_bins')
-	rt=config.getfloat('params', 'rt')
-	coll=config.get('params', 'coll')
-
-	print pRun, pOut, rt, coll
+def init_sim(config, rng, rt, keep_bins):
+	'''
+	New simulation with the SMBH and the stars in each section of config (drawn with the random state rng); rt is the radius of the SMBH.
+	'''
 	sections=config.sections()
 	##Initialized the rebound simulation
 	sim = rebound.Simulation()
@@ -162,12 +97,12 @@ def main():
 		p=config.getfloat(ss, 'p')
 		ang=config.getfloat(ss, 'ang')
 
-		for l in range(0,N): # Adds stars
-			##Use AM's code to generate disk with aligned eccentricity vectors, but a small scatter in i and both omegas...
-			inc, Omega, omega=gen_disk(ang*np.pi/180.)
-			a0=density(a_min, a_max, p)
-			M = rand.uniform(0., 2.*np.pi)
-			sim.add(m = m, a = a0, e = e, inc=inc, Omega = Omega, omega = omega, M = M, primary=sim.particles[0])
+		##Draw all of the stars in the component at once. Use AM's code to generate disk with aligned 
+		##eccentricity vectors, but a small scatter in i and both omegas...
+		inc, Omega, omega=gen_disk(ang*np.pi/180., N, rng)
+		a0=density(a_min, a_max, p, N, rng)
+		M=rng.uniform(0., 2.*np.pi, N)
+		add_orbits(sim, m, a0, e, inc, Omega, omega, M)
 		#print N, m, e, a_min, a_max, i_max
 	
 	f=open('init_disk', 'w')
@@ -180,27 +115,88 @@ def main():
 	# fen=open(name.replace('.bin', '_en'), 'a')
 	# fen.write(sim.gravity+'_'+sim.integrator+'_'+'{0}'.format(sim.dt))
 	if not keep_bins:
-		##Integrate forward a small amount time to initialize accelerations.
 		sim.move_to_com()
-		sim.integrate(1.0e-15)
-		##Look for binaries
-		bins=bin_find_sim(sim)
-		bins=np.array(bins)
-		#print len(bins[:,[1,2]])
-		##Delete all the binaries that we found. The identification of binaries depends in part on the tidal field 
-		##of the star cluster, and this will change as we delete stars. So we repeat the binary 
-		##deletion process several times until there are none left.
-		while len(bins>0):
-			##Delete in reverse order (else the indices would become messed up)
-			to_del=(np.sort(np.unique(bins[:,1]))[::-1]).astype(int)
-			for idx in to_del:
-				sim.remove(idx)
-			sim.integrate(sim.t+sim.t*1.0e-14)
-			bins=bin_find_sim(sim)
+		##Delete one member of each binary. The identification of binaries depends in part on the tidal field 
+		##of the star cluster, and this will change as we delete stars, so bin_strip repeats the search 
+		##until there are none left.
+		bin_strip(sim)
+	return sim
+
+def main():
+	parser=argparse.ArgumentParser(
+		description='Set up a rebound run')
+	parser.add_argument('--config', nargs=1, default='config',
+		help='File containing simulation parameters')
+	# parser.add_argument('--keep_bins', action='store_true',
+	# 	help="Don't delete bins from simulation")
+	parser.add_argument('--restart', metavar='TAG',
+		help='Continue the run with this tag from its latest checkpoint (simOrbit_TAG_ckpt.bin)')
+
+
+	##Parsing command line arguments.
+	args=parser.parse_args()
+	config_file=args.config
+	##Unique tag for output file (or that of the run we are continuing).
+	tag=args.restart if args.restart else str(uuid.uuid4())
+
+	##Default stellar parameters 
+	config=ConfigParser.SafeConfigParser(defaults={'name': 'archive'.format(tag), 'N':'100', 'e':'0.7',
+		'gravity':'basic', 'integrator':'ias15', 'dt':'0', \
+		'a_min':'1.', 'a_max':'2.', 'ang':'2.', 'm':'5e-5', 'keep_bins':'False', 'rt':'1.0e-4', 'coll':'line', 'pRun':'500', 'pOut':'10', 
+		'p':'1', 'pSave':'50', 'find_bins':'False', 'output':'text', 'fields':'all', 'out_buffer':'64',
+		'keep_last':'3', 'keep_every':'50', 'seed':''}, dict_type=OrderedDict)
+	# config.optionxform=str
+	config.read(config_file)
+
+	##Name of our put file 
+	# name=config.get('params', 'name')
+	# name=name+"_"+tag
+	##Number of orbits to run for.
+	pRun=config.getint('params', 'pRun')
+	##Number of times per orbit to save data.
+	pOut=config.getint('params', 'pOut')
+	##Number of times to save data per simulation
+	pSave=config.getint('params', 'pSave')
+	##Checkpoints to keep: the last keep_last, and one every keep_every orbits (0 for none)
+	keep_last=config.getint('params', 'keep_last')
+	keep_every=config.getfloat('params', 'keep_every')
+	times = np.linspace(0, pRun, pRun*pOut+1)
+	print times
+
+	keep_bins=config.getboolean('params', 'keep_bins')
+	find_bins=config.getboolean('params', 'find_bins')
+	rt=config.getfloat('params', 'rt')
+	coll=config.get('params', 'coll')
+	##Output format (text or hdf5), quantities to save and number of outputs buffered in memory (hdf5 only)
+	output=config.get('params', 'output')
+	fields=config.get('params', 'fields')
+	fields=STAR_FIELDS+GLOBAL_FIELDS if fields=='all' else [ff.strip() for ff in fields.split(',')]
+	out_buffer=config.getint('params', 'out_buffer')
+	for ff in fields:
+		if ff not in STAR_FIELDS+GLOBAL_FIELDS:
+			raise ValueError('Unknown output field {0}'.format(ff))
+	if output not in ['text', 'hdf5']:
+		raise ValueError('Unknown output format {0}'.format(output))
+
+	##Seed for the initial conditions (random if not set)
+	seed=config.get('params', 'seed')
+	rng=np.random.RandomState(int(seed) if seed else None)
+
+	print pRun, pOut, rt, coll
+	ckpt_name='simOrbit_{0}_ckpt.bin'.format(tag)
+	if args.restart:
+		##Pick up from the latest checkpoint; the outputs up to its step are already saved.
+		sim,step=load_latest(ckpt_name)
+		start=step+1
+	else:
+		sim=init_sim(config, rng, rt, keep_bins)
+		start=0
 
 	ms=np.array([pp.m for pp in sim.particles])
 	sim.collision=coll
-	sim.collision_resolve=get_tde
+	##TDEs are logged to simOrbit_{tag}_tde (written out at each checkpoint)
+	tdes=TDELog('simOrbit_{0}_tde'.format(tag))
+	sim.collision_resolve=tdes
 
 	##Set up simulation archive for output
 	# sim.automateSimulationArchive(name,interval=2.0*np.pi*pOut,deletefile=True)
@@ -210,75 +206,58 @@ def main():
 	en=sim.calculate_energy()
 	N=sim.N_real-1
 	print rebound.__version__
-	np.savetxt("masses.txt", [sim.particles[i+1].m for i in range(N)])
-
-	# initialize orbital element arrays
-	# each star has its own line. Outputs for each orbital period are separated by spaces. 
-	print len(times)
-	semimajor_axis = np.zeros([N, len(times)])
-	eccentricity = np.zeros([N, len(times)])
-	inclination = np.zeros([N, len(times)])
-	Omega = np.zeros([N, len(times)])
-	omega = np.zeros([N, len(times)])
-	mean_anomaly = np.zeros([N, len(times)])
-	x = np.zeros([N, len(times)])
-	y = np.zeros([N, len(times)])
-	z = np.zeros([N, len(times)])
-	vx = np.zeros([N, len(times)])
-	vy = np.zeros([N, len(times)])
-	vz = np.zeros([N, len(times)])
-
-	E = np.zeros(len(times))
-	Jx = np.zeros(len(times))
-	Jy = np.zeros(len(times))
-	Jz = np.zeros(len(times))
+	if not args.restart:
+		np.savetxt("masses.txt", [sim.particles[i+1].m for i in range(N)])
+
+	if output=='hdf5':
+		##Append each output to a single extendable file
+		writer=SeriesWriter('orbits_{0}.h5'.format(tag), [('t', ())]+[(ff, (N,) if ff in STAR_FIELDS else ()) for ff in fields], nbuf=out_buffer,\
+			start=start if args.restart else None)
+	else:
+		# initialize orbital element arrays
+		# each star has its own line. Outputs for each orbital period are separated by spaces. 
+		print len(times)
+		out=dict([(ff, np.zeros([N, len(times)]) if ff in STAR_FIELDS else np.zeros(len(times))) for ff in fields])
+		if args.restart:
+			for ff in fields:
+				out[ff][...,:start]=np.loadtxt('{0}_{1}.txt'.format(TEXT_NAMES.get(ff, ff), tag))[...,:start]
+	##Checkpoints go to a single simulation archive, indexed by output step (see checkpoint.py)
+	checkpoints=CheckpointStream(ckpt_name, keep_last=keep_last, keep_every=keep_every*2.*np.pi, append=bool(args.restart))
+	if find_bins:
+		##Find binaries at each output while the simulation runs (bin tables for simOrbit_{tag}.bin, see BinCatalog).
+		catalog=BinCatalog('simOrbit_{0}.bin'.format(tag), sim, append=bool(args.restart))
 	
 	for i,time in enumerate(times):
+		if i<start:
+			continue
 		print i
 		sim.move_to_com()
-		orbits=sim.calculate_orbits(primary=sim.particles[0])
-		for j in range(N):
-			# move kepler elements to arrays
-			# the massive star is sim.particles[1], but orbits[0]
-			# there are N+2 total particles, with N+1 stars
-			eccentricity[j,i] = orbits[j].e
-			inclination[j,i] = orbits[j].inc
-			Omega[j,i] = orbits[j].Omega
-			omega[j,i] = orbits[j].omega
-			semimajor_axis[j,i] = orbits[j].a
-			mean_anomaly[j,i] = orbits[j].M
-			x[j,i] = sim.particles[j+1].x
-			y[j,i] = sim.particles[j+1].y
-			z[j,i] = sim.particles[j+1].z
-			vx[j,i] = sim.particles[j+1].vx
-			vy[j,i] = sim.particles[j+1].vy
-			vz[j,i] = sim.particles[j+1].vz
-
-		E[i] = sim.calculate_energy()
-		Jx[i],Jy[i],Jz[i] = sim.calculate_angular_momentum()
+		vals=output_fields(sim, fields)
+		if output=='hdf5':
+			vals['t']=sim.t
+			writer.append(vals)
+		else:
+			for ff in fields:
+				out[ff][...,i]=vals[ff]
+		if find_bins:
+			catalog.add(sim)
 
 		#np.savetxt(name.replace('.bin', '_orb_{0}.dat'.format(orb_idx)), [[oo.a, oo.e, oo.inc, oo.Omega, oo.omega, oo.f] for oo in orbits])
 		sim.integrate(time*2.0*np.pi)
 		if (i % (pSave) == 0) or ((i+1) == pRun*pOut ):
 			# Save arrays to files
-			#np.savetxt('eccentricity.txt', eccentricity, delimiter=' ')
-			np.savetxt('eccentricity_{0}.txt'.format(tag), eccentricity, delimiter=' ')
-			np.savetxt('inclination_{0}.txt'.format(tag), inclination, delimiter=' ')
-			np.savetxt('Omega_{0}.txt'.format(tag), Omega, delimiter=' ')
-			np.savetxt('ommega_{0}.txt'.format(tag), omega, delimiter=' ')
-			np.savetxt('semimajor_axis_{0}.txt'.format(tag), semimajor_axis, delimiter=' ')
-			np.savetxt('mean_anomaly_{0}.txt'.format(tag), mean_anomaly, delimiter=' ')
-			np.savetxt('x_{0}.txt'.format(tag), x, delimiter=' ')
-			np.savetxt('y_{0}.txt'.format(tag), y, delimiter=' ')
-			np.savetxt('z_{0}.txt'.format(tag), z, delimiter=' ')
-			np.savetxt('vx_{0}.txt'.format(tag), vx, delimiter=' ')
-			np.savetxt('vy_{0}.txt'.format(tag), vy, delimiter=' ')
-			np.savetxt('vz_{0}.txt'.format(tag), vz, delimiter=' ')
-			np.savetxt('Energy_{0}.txt'.format(tag),E, delimiter=' ')
-			np.savetxt('Angular_momentum_x_{0}.txt'.format(tag), Jx, delimiter=' ')
-			np.savetxt('Angular_momentum_y_{0}.txt'.format(tag), Jy, delimiter=' ')
-			np.savetxt('Angular_momentum_z_{0}.txt'.format(tag), Jz, delimiter=' ')
-			sim.save('simOrbit_{0}_{1}.bin'.format(tag, i))
+			if output=='hdf5':
+				writer.flush()
+			else:
+				for ff in fields:
+					np.savetxt('{0}_{1}.txt'.format(TEXT_NAMES.get(ff, ff), tag), out[ff], delimiter=' ')
+			checkpoints.save(sim, i)
+			tdes.flush()
+	tdes.close()
+	if output=='hdf5':
+		writer.close()
+	if find_bins:
+		catalog.close()
 
 	# sim.integrate(pRun*2*np.pi)
 	# en2=sim.calculate_energy()
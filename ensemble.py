@@ -0,0 +1,145 @@
+'''
+Number of binaries and velocity dispersion averaged over an ensemble of runs, for all stars or
+for one mass class (light, heavy or mixed pairs; see BinAnalysis.__index_pairs__).
+
+The time series for each run are computed once, for all of the classes, and cached in a
+summary table next to the archive (bin_store.store_name(name, 'summary')). The ensemble
+statistics only read the summaries, so they are cheap to recompute, e.g. for another class.
+'''
+import os
+import numpy as np
+import rebound
+from scipy.interpolate import interp1d
+from scipy.stats import sem
+import bin_analysis
+import bin_store
+from snap_index import snapshot_times
+
+CLASSES=['all', 'light', 'heavy', 'mixed']
+##Pairs counted for each class (see BinAnalysis.num_bins)
+EXTRA={'all':'', 'light':'_light', 'heavy':'_heavy', 'mixed':'_mixed'}
+##Velocity dispersions written by bin_script.py for each class (there is no separate file for
+##mixed pairs, so they use the dispersion of all of the stars).
+SIGS={'all':'_sigs', 'light':'_sigs_low', 'heavy':'_sigs_high', 'mixed':'_sigs'}
+
+
+def num_analytic(num, v, m=5.0e-5):
+	'''
+	Analytic estimate for number of binaries
+
+	num--number of star's in sim
+	v--velocity dispersion
+	m--mass of each star (5x10^-5) by default
+
+	The disk is has an r^-3 surface density profile and extends from r=1 to r=2. (NB the corresponds to dN/da~a^-2)
+	'''
+	##Normalization of r^-3 surface density corresponding to a single star.
+	norm=0.32
+	##Evaluate vh at 1.2 to reproduce v/vh throughout the disk--more motivation?
+	r1=1.2
+	rh=(m/3.)**(1./3.)*r1
+	vh=rh*(r1)**-1.5
+
+	##Numerical pre-factor comes from doing integral over the disk
+	return (7./8.)*(2.*np.pi/3.)/(np.pi)*num**2*norm*(4.*np.pi/3.)*rh**2.*(v/vh)**-4.
+
+
+def num_stars(ms, cls):
+	'''
+	Number of stars (masses ms) in mass class cls; light stars have masses at or below the median.
+	'''
+	mh_thres=np.median(ms)
+	if cls=='light':
+		return np.sum(ms<=mh_thres)
+	elif cls=='heavy':
+		return np.sum(ms>mh_thres)
+	return len(ms)
+
+
+def sig_rows(name, ts, rows=None):
+	'''
+	Rows of the dispersion files of the run name (one row per snapshot in the archive; see scan.Sigs)
+	for the snapshots at times ts (-1 if the archive has no snapshot at that time). Duplicate
+	snapshots are collapsed onto the last one, as in bin_analysis.snapshot_slots.
+
+	rows -- Rows to use if the archive is not there (default one per time in ts).
+	'''
+	if not os.path.exists(name):
+		return np.arange(len(ts)) if rows is None else np.asarray(rows)
+	blobs,tu,cadence=bin_analysis.snapshot_slots(snapshot_times(name)[0])
+	idx=bin_analysis.snap_index(tu, ts)
+	return np.where(idx>=0, blobs[idx], -1)
+
+
+def read_sigs(name, extra, rows):
+	'''
+	z velocity dispersion from the file name+extra in each of rows (nan if missing).
+	'''
+	rows=np.asarray(rows)
+	sigs=np.nan*np.ones(len(rows))
+	fname=name.replace('.bin', extra)
+	if os.path.exists(fname):
+		vs=np.atleast_2d(np.genfromtxt(fname))[:,2]
+		found=(rows>=0) & (rows<len(vs))
+		sigs[found]=vs[rows[found]]
+	return sigs
+
+
+def run_summary(name):
+	'''
+	Number of binaries and z velocity dispersion in each mass class at each snapshot of the run
+	name, as a record array (see bin_store.SCHEMAS['summary']). The summary is cached, and
+	regenerated if the binary tables or the dispersions are newer.
+	'''
+	fname=bin_store.store_name(name, 'summary')
+	deps=[bin_store.store_name(name, 'bins')]+[name.replace('.bin', ss) for ss in set(SIGS.values())]
+	if os.path.exists(fname) and all([os.path.getmtime(dd)<=os.path.getmtime(fname) for dd in deps if os.path.exists(dd)]):
+		try:
+			return np.array(bin_store.read_table(fname, 'summary'))
+		except ValueError:
+			pass
+	bins=bin_analysis.BinAnalysis(name)
+	##Snapshots listed twice in bins.ts are kept once
+	ts,first=np.unique(bins.ts, return_index=True)
+	##The table only has some of the snapshots (see BinAnalysis), so the dispersions are matched by time.
+	rows=sig_rows(name, ts, first)
+	summ=np.empty(len(ts), dtype=bin_store.SCHEMAS['summary'])
+	summ['t']=ts
+	for cls in CLASSES:
+		summ['n_'+cls]=np.atleast_1d(bins.num_bins(extra=EXTRA[cls]))[first]
+		summ['sig_'+cls]=read_sigs(name, SIGS[cls], rows)
+	bin_store.write_table(fname, summ, 'summary')
+	return summ
+
+
+def ensemble(names, cls, t_std, m=5.0e-5, nproc=1):
+	'''
+	Ensemble average over the runs in names for mass class cls, on the grid of times t_std. Runs
+	that do not reach t_std[-1] are skipped.
+
+	m -- Mass of each star (only used for the analytic estimate).
+	nproc -- Number of processes for the runs whose summaries have to be generated.
+
+	Returns the number of runs used, the mean number of binaries and its standard error, and the
+	median and standard error of the analytic estimate (num_analytic) for each run, from the
+	number of stars in the class and their dispersion.
+	'''
+	if nproc>1:
+		pool=rebound.InterruptiblePool(processes=nproc)
+		summs=pool.map(run_summary, names)
+		pool.close()
+	else:
+		summs=map(run_summary, names)
+
+	nums=[]
+	nums_analytic=[]
+	for name,summ in zip(names, summs):
+		if len(summ)<2 or summ['t'][-1]<t_std[-1]:
+			continue
+		nstars=num_stars(bin_store.from_records(bin_store.read_table(bin_store.store_name(name, 'masses'), 'masses')), cls)
+		##Ensure number of binaries evaluate for the same grid of times
+		nums.append(interp1d(summ['t'], summ['n_'+cls])(t_std))
+		nums_analytic.append(interp1d(summ['t'], num_analytic(nstars, summ['sig_'+cls], m))(t_std))
+	if len(nums)==0:
+		raise ValueError('No runs reach t={0}'.format(t_std[-1]))
+	return len(nums), np.mean(nums, axis=0), sem(nums, axis=0), np.median(nums_analytic, axis=0), sem(nums_analytic, axis=0)
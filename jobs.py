@@ -0,0 +1,163 @@
+'''
+Run the analysis of a set of simulation archives (listed in names) locally.
+
+Each archive goes through the tasks in TASKS. A task reads the archive and the outputs of the
+tasks it depends on, and writes its own outputs next to the archive (e.g. scan writes
+archive_masses). Tasks run on a process pool as soon as the tasks they depend on are done, and
+are skipped if their outputs are newer than all of their inputs, so running the analysis of a
+sweep again only redoes what has changed.
+
+Usage: python jobs.py [-n NAMES] [-p NPROC] [--dry-run] [TASK ...] (default all tasks; the tasks
+they depend on are added).
+'''
+import os
+import sys
+import subprocess
+import argparse
+import Queue
+from collections import OrderedDict
+import rebound
+
+import ensemble
+import scan
+
+##Directory with the analysis scripts
+SCRIPTS=os.path.dirname(os.path.abspath(__file__))
+
+##Tasks for each archive: what runs (a script called with the archive name, or a function of the
+##archive name), the suffixes of the files it writes, and the tasks whose outputs it reads.
+TASKS=OrderedDict([
+	##Every product of scan.py, from a single read of the archive
+	('scan', {'func':scan.scan, 'outputs':['_times', '_masses', '_sigs', '_sigs_low', '_sigs_high', '_sigs_light', '_sigs_heavy',\
+		'_elems.hdf5', '_vs.h5', '_bins.bst'], 'deps':[]}),
+	('summary', {'func':ensemble.run_summary, 'outputs':['_summary.bst'], 'deps':['scan']}),
+	])
+
+
+def outputs(task, name):
+	return [name.replace('.bin', ss) for ss in TASKS[task]['outputs']]
+
+
+def inputs(task, name):
+	'''
+	Files read by task for the archive name: the archive and the outputs of the tasks it depends on.
+	'''
+	return [name]+[ff for dd in TASKS[task]['deps'] for ff in outputs(dd, name)]
+
+
+def up_to_date(task, name):
+	'''
+	Whether all of the outputs of task exist and are newer than its inputs.
+	'''
+	outs=outputs(task, name)
+	if not all([os.path.exists(ff) for ff in outs]):
+		return False
+	ins=[os.path.getmtime(ff) for ff in inputs(task, name) if os.path.exists(ff)]
+	return len(ins)==0 or min([os.path.getmtime(ff) for ff in outs])>=max(ins)
+
+
+def with_deps(tasks):
+	'''
+	The tasks and all of the tasks they depend on, in the order of TASKS.
+	'''
+	need=set()
+	stack=list(tasks)
+	while stack:
+		tt=stack.pop()
+		if tt not in need:
+			need.add(tt)
+			stack.extend(TASKS[tt]['deps'])
+	return [tt for tt in TASKS if tt in need]
+
+
+def run_task(job):
+	'''
+	Run task for the archive name (job is (task, name)); returns (task, name, error message or None).
+	'''
+	task,name=job
+	try:
+		if 'script' in TASKS[task]:
+			status=subprocess.call([sys.executable, os.path.join(SCRIPTS, TASKS[task]['script']), name])
+			if status!=0:
+				return task, name, '{0} exited with status {1}'.format(TASKS[task]['script'], status)
+		else:
+			TASKS[task]['func'](name)
+	except Exception as e:
+		return task, name, repr(e)
+	##Mark the outputs as up to date, even if the task found nothing to change
+	for ff in outputs(task, name):
+		if os.path.exists(ff):
+			os.utime(ff, None)
+	return task, name, None
+
+
+def run(names, tasks=None, nproc=1, dry_run=False):
+	'''
+	Run tasks (default all) for each of the archives in names, with at most nproc at a time.
+
+	Returns a dictionary with the status of each (task, name): 'done', 'skipped' (up to date),
+	'failed', or 'blocked' (a task it depends on failed).
+	'''
+	tasks=with_deps(tasks if tasks else TASKS.keys())
+	waiting=dict([((tt, nn), set([(dd, nn) for dd in TASKS[tt]['deps'] if dd in tasks])) for nn in names for tt in tasks])
+	status={}
+	finished=Queue.Queue()
+	pool=rebound.InterruptiblePool(processes=nproc) if not dry_run else None
+	running=0
+	while waiting or running:
+		##Start everything whose dependencies have finished
+		for job in sorted([jj for jj,deps in waiting.items() if deps.issubset(status)], key=lambda jj: tasks.index(jj[0])):
+			deps=waiting.pop(job)
+			if any([status[dd] in ('failed', 'blocked') for dd in deps]):
+				status[job]='blocked'
+			elif up_to_date(*job) and not any([status[dd]=='done' for dd in deps]):
+				status[job]='skipped'
+			elif dry_run:
+				print 'would run', job[0], job[1]
+				status[job]='done'
+			else:
+				pool.apply_async(run_task, (job,), callback=finished.put)
+				running+=1
+		if not running:
+			continue
+		##Block until a task finishes (the timeout keeps the wait interruptible)
+		while True:
+			try:
+				task,name,err=finished.get(timeout=1.0)
+				break
+			except Queue.Empty:
+				pass
+		running-=1
+		if err is None:
+			status[(task, name)]='done'
+			print 'done', task, name
+		else:
+			status[(task, name)]='failed'
+			print 'failed', task, name, err
+	if pool is not None:
+		pool.close()
+		pool.join()
+	return status
+
+
+def main():
+	parser=argparse.ArgumentParser(description='Run the analysis of the simulation archives listed in names')
+	parser.add_argument('tasks', nargs='*', help='Tasks to run (default all): '+', '.join(TASKS.keys()))
+	parser.add_argument('-n', '--names', default='names', help='File with the names of the archives')
+	parser.add_argument('-p', '--nproc', type=int, default=1, help='Maximum number of tasks to run at once')
+	parser.add_argument('--dry-run', action='store_true', help='Only print the tasks that would run')
+	args=parser.parse_args()
+	for tt in args.tasks:
+		if tt not in TASKS:
+			parser.error('Unknown task {0}'.format(tt))
+
+	names=[line.strip() for line in open(args.names) if line.strip()]
+	status=run(names, args.tasks, nproc=args.nproc, dry_run=args.dry_run)
+	counts=[(ss, sum([vv==ss for vv in status.values()])) for ss in ['done', 'skipped', 'failed', 'blocked']]
+	print ', '.join(['{1} {0}'.format(ss, cc) for ss,cc in counts])
+	if any([vv in ('failed', 'blocked') for vv in status.values()]):
+		sys.exit(1)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,160 @@
+'''
+Orbital elements of all stars around the SMBH (particle 0), computed from the position and
+velocity arrays in one pass.
+
+Follows reb_tools_particle_to_orbit (rebound 3.8), so the results match
+sim.calculate_orbits(primary=sim.particles[0]) element by element, without building a
+python Orbit object per star.
+'''
+import numpy as np
+
+##Elements returned by orbit_elements (same names as the attributes of rebound's Orbit)
+ELEMENTS=['a', 'e', 'inc', 'Omega', 'omega', 'pomega', 'f', 'M', 'l', 'theta', 'd', 'v', 'h', 'n', 'P']
+##Same thresholds as rebound for near planar and near circular orbits
+MIN_INC=1.e-8
+MIN_ECC=1.e-8
+
+
+def acos2(num, denom, disambiguator):
+	'''
+	Vectorized version of rebound's acos2: acos(num/denom), negated where disambiguator<0.
+	Returns pi (0) where num/denom<=-1 (>=1), and 0 where denom is 0.
+	'''
+	with np.errstate(divide='ignore', invalid='ignore'):
+		cosine=num/denom
+	inside=(cosine>-1.) & (cosine<1.)
+	val=np.where(cosine<=-1., np.pi, 0.)
+	val[inside]=np.arccos(cosine[inside])
+	val[inside & (disambiguator<0.)]*=-1.
+	return val
+
+
+def orbit_elements(xyz, vxyz, ms, G=1.):
+	'''
+	Orbital elements of particles 1,...,N-1 with respect to particle 0, with mu=G*(m0+m).
+
+	xyz, vxyz, ms -- Positions, velocities and masses of all particles (e.g. from sim_state).
+
+	Returns a dictionary of arrays of length N-1, keyed by the names in ELEMENTS.
+	'''
+	xyz=np.asarray(xyz, dtype=float)
+	vxyz=np.asarray(vxyz, dtype=float)
+	ms=np.asarray(ms, dtype=float)
+	mu=G*(ms[1:]+ms[0])
+	dx,dy,dz=(xyz[1:]-xyz[0]).T
+	dvx,dvy,dvz=(vxyz[1:]-vxyz[0]).T
+
+	o={}
+	with np.errstate(divide='ignore', invalid='ignore'):
+		o['d']=np.sqrt(dx*dx+dy*dy+dz*dz)
+		vsquared=dvx*dvx+dvy*dvy+dvz*dvz
+		o['v']=np.sqrt(vsquared)
+		vcircsquared=mu/o['d']
+		o['a']=-mu/(vsquared-2.*vcircsquared)
+		##Angular momentum
+		hx=dy*dvz-dz*dvy
+		hy=dz*dvx-dx*dvz
+		hz=dx*dvy-dy*dvx
+		o['h']=np.sqrt(hx*hx+hy*hy+hz*hz)
+
+		vdiffsquared=vsquared-vcircsquared
+		vr=(dx*dvx+dy*dvy+dz*dvz)/o['d']
+		rvr=o['d']*vr
+		muinv=1./mu
+		##Eccentricity vector
+		ex=muinv*(vdiffsquared*dx-rvr*dvx)
+		ey=muinv*(vdiffsquared*dy-rvr*dvy)
+		ez=muinv*(vdiffsquared*dz-rvr*dvz)
+		e=np.sqrt(ex*ex+ey*ey+ez*ez)
+		o['e']=e
+		o['n']=np.sign(o['a'])*np.sqrt(np.abs(mu/o['a']**3.))
+		o['P']=2.*np.pi/o['n']
+
+		inc=acos2(hz, o['h'], np.ones_like(hz))
+		o['inc']=inc
+		##Line of nodes
+		nx=-hy
+		ny=hx
+		n=np.sqrt(nx*nx+ny*ny)
+		Omega=acos2(nx, n, ny)
+		o['Omega']=Omega
+
+		##Mean anomaly; elliptical and hyperbolic orbits
+		M=np.empty_like(e)
+		ell=(e<1.)
+		ea=acos2(1.-o['d'][ell]/o['a'][ell], e[ell], vr[ell])
+		M[ell]=ea-e[ell]*np.sin(ea)
+		ea=np.arccosh((1.-o['d'][~ell]/o['a'][~ell])/e[~ell])
+		ea[vr[~ell]<0.]*=-1.
+		M[~ell]=e[~ell]*np.sinh(ea)-ea
+		o['M']=M
+
+		##Nearly planar orbits: use the longitudes, which are well defined
+		planar=(inc<MIN_INC) | (inc>np.pi-MIN_INC)
+		theta_p=acos2(dx, o['d'], dy)
+		pomega_p=acos2(ex, e, ey)
+		##Otherwise omega+f and omega are measured from the line of nodes
+		wpf=acos2(nx*dx+ny*dy, n*o['d'], dz)
+		omega_np=acos2(nx*ex+ny*ey, n*e, ez)
+
+	pro=(inc<np.pi/2.)
+	sgn=np.where(pro, 1., -1.)
+	o['omega']=np.where(planar, sgn*(pomega_p-Omega), omega_np)
+	o['f']=np.where(planar, sgn*(theta_p-pomega_p), wpf-omega_np)
+	o['pomega']=np.where(planar, pomega_p, Omega+sgn*omega_np)
+	o['theta']=np.where(planar, theta_p, Omega+sgn*wpf)
+	##Mean longitude; for e<<1 pomega is ill defined, so use l=theta+(M-f)
+	o['l']=np.where(e>MIN_ECC, o['pomega']+sgn*M, o['theta']-sgn*2.*e*np.sin(o['f']))
+	return o
+
+
+def sim_elements(sim, names=ELEMENTS):
+	'''
+	Orbital elements of all of the stars in sim with respect to the SMBH (particle 0), as
+	an array with one row per star and one column per element in names.
+	'''
+	xyz=np.zeros([sim.N, 3])
+	vxyz=np.zeros([sim.N, 3])
+	ms=np.zeros(sim.N)
+	sim.serialize_particle_data(xyz=xyz, vxvyvz=vxyz, m=ms)
+	o=orbit_elements(xyz, vxyz, ms, G=sim.G)
+	return np.column_stack([o[nn] for nn in names])
+
+
+def mean_to_true(e, M, tol=1.0e-16, maxiter=100):
+	'''
+	True anomaly for eccentricities e<1 and mean anomalies M (Newton iteration for the eccentric
+	anomaly, as in reb_tools_M_to_f).
+	'''
+	e,M=np.broadcast_arrays(np.asarray(e, dtype=float), np.mod(M, 2.*np.pi))
+	if np.any(e>=1.):
+		raise ValueError('Only bound orbits (e<1) are supported')
+	E=np.where(e<0.8, M, np.pi)
+	for ii in range(maxiter):
+		F=E-e*np.sin(E)-M
+		if np.all(np.abs(F)<tol):
+			break
+		E=E-F/(1.-e*np.cos(E))
+	return 2.*np.arctan(np.sqrt((1.+e)/(1.-e))*np.tan(0.5*E))
+
+
+def orbit_state(m0, ms, a, e, inc, Omega, omega, M, G=1.):
+	'''
+	Inverse of orbit_elements for bound orbits: positions and velocities (arrays of shape (N, 3))
+	relative to a primary of mass m0, for stars of masses ms with the given elements (arrays,
+	or scalars shared by all of the stars). Follows reb_tools_orbit_to_particle.
+	'''
+	ms,a,e,inc,Omega,omega,M=[np.asarray(xx, dtype=float) for xx in (ms, a, e, inc, Omega, omega, M)]
+	f=mean_to_true(e, M)
+	r=a*(1.-e*e)/(1.+e*np.cos(f))
+	v0=np.sqrt(G*(ms+m0)/a/(1.-e*e))
+	cO,sO=np.cos(Omega), np.sin(Omega)
+	co,so=np.cos(omega), np.sin(omega)
+	cf,sf=np.cos(f), np.sin(f)
+	ci,si=np.cos(inc), np.sin(inc)
+	##Murray & Dermott Eqs. 2.122 and 2.36
+	xyz=np.column_stack(np.broadcast_arrays(r*(cO*(co*cf-so*sf)-sO*(so*cf+co*sf)*ci),\
+		r*(sO*(co*cf-so*sf)+cO*(so*cf+co*sf)*ci), r*(so*cf+co*sf)*si))
+	vxyz=np.column_stack(np.broadcast_arrays(v0*((e+cf)*(-ci*co*sO-cO*so)-sf*(co*cO-ci*so*sO)),\
+		v0*((e+cf)*(ci*co*cO-sO*so)-sf*(co*sO+ci*so*cO)), v0*((e+cf)*co*si-sf*si*so)))
+	return xyz, vxyz
@@ -1,11 +1,7 @@
 import sys
-import rebound
-import numpy as np
+from rebound_runs.scan import scan
 
 name=sys.argv[1]
 print name
-sa=rebound.SimulationArchive(name)
-ms = np.array([pp.m for pp in sa[0].particles[1:]])
-ms = np.array(ms)
-
-np.savetxt(name.replace('.bin', '_masses'), ms)
\ No newline at end of file
+##Stellar masses (_masses) (see scan.py)
+scan(name, ['masses'])
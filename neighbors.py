@@ -0,0 +1,157 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+##Fractional padding of the search radius; protects against round-off in the binary criteria.
+REACH_PAD=1.0e-6
+
+
+def hill_reach(xyz, ms, skin=0.):
+	'''
+	For each particle, the largest separation at which it can be part of a binary
+	that passes the Hill sphere test in bin_find (particle 0, the SMBH, gets 0).
+
+	A bound pair has separation d<=2 a_bin and we require a_bin<((m1+m2)/m0)^(1/3)*com_d. 
+	com_d is at most the larger of the two stars' distances from the origin, so a pair can 
+	only be a binary if d is smaller than the reach of one of its members.
+
+	xyz -- particle positions (com frame)
+	ms -- particle masses
+	skin -- Reach that remains valid after every star has moved by up to skin (see NeighborList)
+	'''
+	##Only the SMBH: no binaries
+	if len(ms)<2:
+		return np.zeros(len(ms))
+	m0=ms[0]
+	r=np.sum(xyz*xyz, axis=1)**0.5
+	reach=2.*(1.+REACH_PAD)*((ms+np.max(ms[1:]))/m0)**(1./3.)*(r+skin)+2.*skin
+	reach[0]=0.
+	return reach
+
+
+def ball_pairs(tree, tidx, xyz, qq, reach):
+	'''
+	Keys i1*N+i2 (i1<i2) of all pairs formed by a star in qq and a star in the tree
+	that are closer than the reach of the star in qq. Query stars are grouped into 
+	factor of two bins in reach, and each bin is searched with its largest reach.
+
+	tree -- cKDTree of the positions xyz[tidx]
+	'''
+	N=len(reach)
+	qq=qq[reach[qq]>0]
+	lbin=np.floor(np.log2(reach[qq]))
+	keys=[np.array([], dtype=int)]
+	for lb in np.unique(lbin):
+		qb=qq[lbin==lb]
+		nbrs=cKDTree(xyz[qb]).sparse_distance_matrix(tree, np.max(reach[qb]), output_type='ndarray')
+		ii=qb[nbrs['i']]
+		jj=tidx[nbrs['j']]
+		filt=(jj>0) & (jj!=ii) & (nbrs['v']<=reach[ii])
+		keys.append(np.minimum(ii, jj)[filt]*N+np.maximum(ii, jj)[filt])
+	return np.concatenate(keys)
+
+
+def cand_pairs(xyz, reach, idx=None):
+	'''
+	Candidate binaries: all pairs of stars (excluding particle 0) whose separation is 
+	less than the reach of either star, found with a KD-tree.
+
+	idx -- If given, only return the pairs that involve at least one of these stars.
+
+	Returns index arrays i1, i2 (i1<i2), in the same order as combinations(range(1, N), 2).
+	'''
+	N=len(reach)
+	every=np.arange(N)
+	if idx is None:
+		keys=ball_pairs(cKDTree(xyz), every, xyz, every[1:], reach)
+	else:
+		idx=np.asarray(idx, dtype=int)
+		##Pairs within the reach of the selected stars, and pairs within the reach of the other star.
+		keys=np.concatenate([ball_pairs(cKDTree(xyz), every, xyz, idx, reach),\
+			ball_pairs(cKDTree(xyz[idx]), idx, xyz, every[1:], reach)])
+	##np.unique sorts the keys, which puts the pairs in lexicographic order.
+	keys=np.unique(keys)
+	return keys//N, keys%N
+
+
+class NeighborList(object):
+	def __init__(self, skin=0.05):
+		'''
+		Verlet-style list of candidate binaries that is reused across consecutive snapshots.
+
+		Each star keeps a reference position, and the list contains every pair that is within 
+		reach (padded by skin, see hill_reach) at the reference positions. The list stays valid 
+		as long as no star is more than skin away from its reference position. Stars that move 
+		further are given a new reference position and only their pairs are searched again.
+
+		Displacements are measured in a frame rotating with the mean angular velocity of the stars 
+		about the z-axis, so that the bulk orbital motion of the disk does not count. (A rotation 
+		about the origin preserves both the separations and the distances from the origin that 
+		enter hill_reach.) Shear still moves stars, and if the list has to be rebuilt at every 
+		snapshot the skin only adds candidates, so in that case it is dropped for later builds.
+		'''
+		self.skin=skin
+		self.nserved=0
+		self.xyz0=None
+		self.ms0=None
+		self.nbuild=0
+		self.nupdate=0
+		self.ncall=0
+
+	def __rotate__(self, t, xyz):
+		'''
+		Rotate positions into the frame of the last full build.
+		'''
+		th=-self.omega*(t-self.t0)
+		ct,st=np.cos(th), np.sin(th)
+		return np.column_stack([ct*xyz[:,0]-st*xyz[:,1], st*xyz[:,0]+ct*xyz[:,1], xyz[:,2]])
+
+	def __build__(self, t, xyz, vxyz, ms):
+		self.t0=t
+		self.xyz0=np.copy(xyz)
+		self.ms0=np.copy(ms)
+		##Mean angular velocity of the stars about the z-axis (L_z/I_z)
+		jz=ms[1:]*(xyz[1:,0]*vxyz[1:,1]-xyz[1:,1]*vxyz[1:,0])
+		iz=ms[1:]*(xyz[1:,0]**2.+xyz[1:,1]**2.)
+		self.omega=np.sum(jz)/np.sum(iz)
+		self.i1, self.i2=cand_pairs(xyz, hill_reach(xyz, ms, self.skin))
+		self.nbuild+=1
+		##Number of snapshots served by the list since it was built
+		self.nserved=1
+
+	def __update__(self, xyz, moved):
+		'''
+		Move the reference positions of the stars in moved to xyz and redo their pairs.
+		'''
+		N=len(self.ms0)
+		self.xyz0[moved]=xyz[moved]
+		is_moved=np.zeros(N, dtype=bool)
+		is_moved[moved]=True
+		keep=~(is_moved[self.i1] | is_moved[self.i2])
+		i1,i2=cand_pairs(self.xyz0, hill_reach(self.xyz0, self.ms0, self.skin), moved)
+		keys=np.unique(np.concatenate([self.i1[keep]*N+self.i2[keep], i1*N+i2]))
+		self.i1,self.i2=keys//N, keys%N
+		self.nupdate+=1
+
+	def pairs(self, t, xyz, vxyz, ms):
+		'''
+		Candidate pairs (i1, i2) for the snapshot at time t with positions xyz, velocities 
+		vxyz and masses ms (com frame). Updates the list if needed.
+		'''
+		self.ncall+=1
+		if (self.xyz0 is None) or (len(ms)!=len(self.ms0)) or np.any(ms!=self.ms0):
+			self.__build__(t, xyz, vxyz, ms)
+			return self.i1, self.i2
+
+		xyz_rot=self.__rotate__(t, xyz)
+		dx=xyz_rot-self.xyz0
+		moved=np.where(np.sum(dx*dx, axis=1)>self.skin**2.)[0]
+		##Rebuild from scratch if most of the stars have moved.
+		if len(moved)>0.5*len(ms):
+			if self.nserved==1:
+				self.skin=0.
+			self.__build__(t, xyz, vxyz, ms)
+			return self.i1, self.i2
+		if len(moved)>0:
+			self.__update__(xyz_rot, moved)
+		self.nserved+=1
+		return self.i1, self.i2
@@ -1,6 +1,7 @@
 import rebound
 import sys
 import numpy as np
+from tde import TDELog
 
 def heartbeat(sim):
 	print(sim.contents.dt, sim.contents.t)
@@ -9,21 +10,18 @@ def heartbeat(sim):
 # See ctypes documentation for details.
 	# print(sim.contents.dt)
 
-def get_tde(sim, reb_coll):
-	orbits = sim[0].calculate_orbits(primary=sim[0].particles[0])
-	p1,p2 = reb_coll.p1, reb_coll.p2
-	idx, idx0 = max(p1, p2), min(p1, p2)
-	if idx0==0:
-		##idx decremented by 1 because there is no orbit 0
-		print sim[0].t, orbits[idx-1].e, idx, 'TDE!'
-
-	return 0
-
 tmax = 500.
 sim = rebound.Simulation.from_archive(sys.argv[1])
 sim.automateSimulationArchive(sys.argv[1],interval=np.pi*0.2,deletefile=False)
 if sim.t>=tmax*2*np.pi:
 	sys.exit(0)
 sim.simulationarchive_next=sim.t+0.2*np.pi	
-sim.collision_resolve=get_tde
+##Append to the TDE log of the original run (written out at each snapshot)
+tdes=TDELog(sys.argv[1].replace('.bin', '_tde'))
+sim.collision_resolve=tdes
+for tt in np.arange(sim.simulationarchive_next, tmax*2*np.pi, 0.2*np.pi):
+	##Stop on the step that crosses tt, i.e. the one where the snapshot is saved.
+	sim.integrate(tt, exact_finish_time=0)
+	tdes.flush()
 sim.integrate(tmax*2*np.pi)
+tdes.close()
@@ -0,0 +1,256 @@
+'''
+Single pass over a simulation archive that produces several analysis outputs at once.
+
+Each snapshot is decoded once and handed to a list of consumers, one per product (see
+PRODUCTS). The consumers write the same files as the scripts that used to read the archive
+separately (time_script.py, mass_script.py, bin_script.py, sig_gen_filt.py, sig_script_2pop.py
+and BinAnalysis).
+
+Usage: python scan.py NAME [PRODUCT ...] (default all products)
+'''
+import os
+import sys
+from collections import OrderedDict
+import numpy as np
+import rebound
+
+import bin_analysis
+import bin_store
+from kepler import orbit_elements
+from neighbors import NeighborList
+from series_store import ElemWriter
+from snap_index import snapshot_times
+
+
+class Snapshot(object):
+	'''
+	Snapshot shared by the consumers: the simulation, its time, the positions, velocities and
+	masses of all of the particles, and (computed on first use) the orbital elements of the stars.
+	'''
+	def __init__(self, sim):
+		self.sim=sim
+		self.t=sim.t
+		self.xyz,self.vxyz,self.ms=bin_analysis.sim_state(sim)
+		self.__orbits=None
+
+	def orbits(self):
+		'''
+		Orbital elements of the stars with respect to the SMBH (see kepler.orbit_elements).
+		'''
+		if self.__orbits is None:
+			self.__orbits=orbit_elements(self.xyz, self.vxyz, self.ms, G=self.sim.G)
+		return self.__orbits
+
+
+class Consumer(object):
+	'''
+	Base class for the products of a scan of the archive name. open is called with the archive
+	before the first snapshot, add with the index and Snapshot of each snapshot listed by needs (in
+	archive order), and close after the last one. Consumers that do not need the snapshots
+	(snapshots=False) only get open and close, and snapshots are only decoded if some consumer
+	needs them.
+	'''
+	snapshots=True
+
+	def __init__(self, name):
+		self.name=name
+
+	def open(self, sa):
+		pass
+
+	def needs(self, nsnap):
+		'''
+		Indices of the snapshots passed to add, out of the nsnap in the archive (called after open).
+		'''
+		return range(nsnap) if self.snapshots else []
+
+	def add(self, ii, snap):
+		pass
+
+	def close(self):
+		pass
+
+
+class Times(Consumer):
+	'''
+	Times of all of the snapshots (_times), from the headers of the snapshots (see snap_index).
+	'''
+	snapshots=False
+
+	def open(self, sa):
+		##Only the snapshots in sa (the archive may have grown since it was opened)
+		self.ts=snapshot_times(self.name)[0][:len(sa)]
+
+	def close(self):
+		np.savetxt(self.name.replace('.bin', '_times'), self.ts)
+
+
+class Masses(Consumer):
+	'''
+	Masses of the stars in the first snapshot (_masses).
+	'''
+	snapshots=False
+
+	def open(self, sa):
+		sim=sa[0]
+		np.savetxt(self.name.replace('.bin', '_masses'), [pp.m for pp in sim.particles[1:]])
+
+
+class Sigs(Consumer):
+	'''
+	Velocity dispersions (x, y and z) of the bound stars at each snapshot: all of them (_sigs),
+	and those with masses at or below (_sigs_low) and above (_sigs_high) the median.
+	'''
+	def open(self, sa):
+		self.sigs=dict([(extra, np.empty([len(sa), 3])) for extra in ['_sigs', '_sigs_low', '_sigs_high']])
+
+	def add(self, ii, snap):
+		vs=snap.vxyz[1:]
+		ms=snap.ms[1:]
+		##Ignore any unbound stars
+		bound=(snap.orbits()['a']>0)
+		light=(ms<=np.median(ms))
+		self.sigs['_sigs'][ii]=np.std(vs[bound], axis=0)
+		self.sigs['_sigs_low'][ii]=np.std(vs[light & bound], axis=0)
+		self.sigs['_sigs_high'][ii]=np.std(vs[~light & bound], axis=0)
+
+	def close(self):
+		for extra,sigs in self.sigs.items():
+			np.savetxt(self.name.replace('.bin', extra), sigs)
+
+
+class Sigs2pop(Consumer):
+	'''
+	Velocity dispersions of the light (m<1e-4; _sigs_light) and heavy (m>1e-4; _sigs_heavy) stars.
+	'''
+	def open(self, sa):
+		self.sigs_light=np.empty([len(sa), 3])
+		self.sigs_heavy=np.empty([len(sa), 3])
+
+	def add(self, ii, snap):
+		vs=snap.vxyz[1:]
+		ms=snap.ms[1:]
+		self.sigs_light[ii]=np.std(vs[ms<1.0e-4], axis=0)
+		self.sigs_heavy[ii]=np.std(vs[ms>1.0e-4], axis=0)
+
+	def close(self):
+		np.savetxt(self.name.replace('.bin', '_sigs_light'), self.sigs_light)
+		np.savetxt(self.name.replace('.bin', '_sigs_heavy'), self.sigs_heavy)
+
+
+class Elems(Consumer):
+	'''
+	Orbital elements of all of the stars at each snapshot (_elems.hdf5; see series_store.read_elems).
+	'''
+	def __init__(self, name, elem_names=['a', 'e', 'inc', 'omega']):
+		Consumer.__init__(self, name)
+		self.elem_names=elem_names
+		self.writer=None
+
+	def add(self, ii, snap):
+		if self.writer is None:
+			self.writer=ElemWriter(self.name.replace('.bin', '_elems.hdf5'), len(snap.ms)-1, self.elem_names)
+		orbits=snap.orbits()
+		self.writer.append(snap.t, np.column_stack([orbits[en] for en in self.elem_names]))
+
+	def close(self):
+		if self.writer is not None:
+			self.writer.close()
+
+
+class Vs(Consumer):
+	'''
+	Semimajor axes and z velocities of the stars with masses at or below the median (_vs.h5; elements
+a and vz, see series_store.read_elems).
+	'''
+	def __init__(self, name):
+		Consumer.__init__(self, name)
+		self.writer=None
+
+	def add(self, ii, snap):
+		ms=snap.ms[1:]
+		if self.writer is None:
+			self.light=(ms<=np.median(ms))
+			self.writer=ElemWriter(self.name.replace('.bin', '_vs.h5'), np.sum(self.light), ['a', 'vz'])
+		self.writer.append(snap.t, np.column_stack([snap.orbits()['a'][self.light], snap.vxyz[1:,2][self.light]]))
+
+	def close(self):
+		if self.writer is not None:
+			self.writer.close()
+
+
+class Bins(Consumer):
+	'''
+	Bin table in the format of BinAnalysis (_bins.csv, _times and _masses, the binary store and
+	_bins_meta; see bin_analysis.BinTables), for the snapshots selected by bin_analysis.snapshot_slots.
+	If the archive has grown since the tables were written (e.g. after restart.py), only the new
+	snapshots are analyzed and added to them, as in BinAnalysis.__bin_update__. The _times file lists
+	the analyzed snapshots, as for BinAnalysis, so it replaces the one written by Times.
+	'''
+	def __init__(self, name, interval=0.2*np.pi):
+		Consumer.__init__(self, name)
+		self.interval=interval
+		##Size of the archive before scan opens it: it may still be growing, and the tables should
+		##not be marked as covering more of it than the snapshots we analyze (see write_meta).
+		self.size=os.path.getsize(name)
+
+	def open(self, sa):
+		##Only the snapshots in sa (the archive may have grown since it was opened)
+		blobs,ts,cadence=bin_analysis.snapshot_slots(snapshot_times(self.name)[0][:len(sa)], self.interval)
+		sim=sa[0]
+		self.masses=np.array([pp.m for pp in sim.particles[1:]])
+		##Add to complete tables (see write_meta) if the snapshots in them still come first.
+		nn=None
+		if bin_analysis.read_meta(self.name)[0]>0:
+			try:
+				ts_old=bin_store.from_records(bin_store.read_table(bin_store.store_name(self.name, 'times'), 'times'))
+				bin_store.read_header(bin_store.store_name(self.name, 'bins'), 'bins')
+				nn=bin_analysis.tables_cover(self.name, ts_old, ts, self.size)
+			except (IOError, OSError, ValueError):
+				pass
+		if nn is None:
+			self.tables=bin_analysis.BinTables(self.name)
+			self.ts=ts
+			self.blobs=blobs
+		else:
+			self.tables=bin_analysis.BinTables(self.name, t_last=ts_old[-1])
+			self.ts=np.concatenate([ts_old, ts[nn:]])
+			self.blobs=blobs[nn:]
+		self.nlist=NeighborList()
+
+	def needs(self, nsnap):
+		return self.blobs
+
+	def add(self, ii, snap):
+		self.tables.add(bin_analysis.bin_find_sim(snap.sim, nlist=self.nlist))
+
+	def close(self):
+		self.tables.close(self.ts, self.masses, self.size)
+
+##Consumer for each product, in the order in which they are closed
+PRODUCTS=OrderedDict([('times', Times), ('masses', Masses), ('sigs', Sigs), ('sigs_2pop', Sigs2pop),\
+	('elems', Elems), ('vs', Vs), ('bins', Bins)])
+
+
+def scan(name, products=None):
+	'''
+	Read each snapshot of the archive name that the products need once, and write the outputs of
+	products (default all; see PRODUCTS).
+	'''
+	##The consumers are set up before the archive is opened (see Bins).
+	consumers=[PRODUCTS[pp](name) for pp in (products if products else PRODUCTS.keys())]
+	sa=rebound.SimulationArchive(name)
+	for cc in consumers:
+		cc.open(sa)
+	needs=[set(cc.needs(len(sa))) for cc in consumers]
+	for ii in sorted(set().union(*needs)):
+		snap=Snapshot(sa[ii])
+		for cc,nn in zip(consumers, needs):
+			if ii in nn:
+				cc.add(ii, snap)
+	for cc in consumers:
+		cc.close()
+
+
+if __name__ == '__main__':
+	scan(sys.argv[1], sys.argv[2:])
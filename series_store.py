@@ -0,0 +1,148 @@
+'''
+Append-only HDF5 store for quantities saved at every output of a run (e.g. the orbital elements
+of all of the stars, the energy and angular momentum).
+
+Each field is a dataset whose first axis is the output index, e.g. eccentricity has shape
+(number of outputs, number of stars). Datasets are chunked and extendable along the first axis;
+outputs are held in a small buffer and written a block at a time, so that the cost of each
+write does not grow with the length of the run.
+
+ElemWriter uses the same layout for snapshots of the orbital elements of the stars: a single
+compressed dataset elems with shape (snapshot, star, element) and a time coordinate t, in place of
+one table per snapshot. read_elems returns slices of it by snapshot or by star. This is the format
+of the _elems.hdf5 and _vs.h5 files of scan.py; read_elems also reads those written before, with
+a table per snapshot (/{ii} in _elems.hdf5 and /bin/{ii} in _vs.h5).
+'''
+import numpy as np
+import h5py
+from collections import OrderedDict
+
+##Target size of an HDF5 chunk in bytes
+CHUNK_BYTES=2**20
+
+
+class SeriesWriter(object):
+	'''
+	Append outputs to the HDF5 file fname.
+
+	fname -- Name of the output file (overwritten).
+	shapes -- List of (field, shape) pairs; shape is the shape of the field at a single output
+	(e.g. (N,) for per star quantities and () for scalars).
+	nbuf -- Number of outputs to hold in memory before writing to disk.
+	compression -- HDF5 compression filter for the datasets (e.g. 'gzip'; default none).
+	start -- Keep the first start outputs of the existing file fname and append after them (e.g.
+	after a restart) instead of overwriting it.
+	'''
+	def __init__(self, fname, shapes, nbuf=64, compression=None, start=None):
+		self.fname=fname
+		self.shapes=OrderedDict([(ff, tuple(ss)) for ff,ss in shapes])
+		self.nbuf=nbuf
+		self.nrows=0
+		self.nb=0
+		self.buf={}
+		if start is not None:
+			self.f=h5py.File(fname, 'r+')
+			self.nrows=start
+			for ff,ss in self.shapes.items():
+				self.buf[ff]=np.empty((nbuf,)+ss)
+				self.f[ff].resize(start, axis=0)
+			return
+		self.f=h5py.File(fname, 'w')
+		for ff,ss in self.shapes.items():
+			self.buf[ff]=np.empty((nbuf,)+ss)
+			rows=int(max(1, min(nbuf, CHUNK_BYTES//(8*np.prod(ss, dtype=int)))))
+			self.f.create_dataset(ff, shape=(0,)+ss, maxshape=(None,)+ss, chunks=(rows,)+ss, dtype='f8',\
+				compression=compression)
+
+	def append(self, values):
+		'''
+		Add one output. values is a dictionary with an entry for each field.
+		'''
+		for ff in self.shapes:
+			self.buf[ff][self.nb]=values[ff]
+		self.nb+=1
+		if self.nb==self.nbuf:
+			self.flush()
+
+	def flush(self):
+		'''
+		Write the buffered outputs to disk.
+		'''
+		if self.nb>0:
+			for ff in self.shapes:
+				dset=self.f[ff]
+				dset.resize(self.nrows+self.nb, axis=0)
+				dset[self.nrows:]=self.buf[ff][:self.nb]
+			self.nrows+=self.nb
+			self.nb=0
+		self.f.flush()
+
+	def close(self):
+		self.flush()
+		self.f.close()
+
+
+class ElemWriter(SeriesWriter):
+	'''
+	Append snapshots of the orbital elements of nstars stars to the HDF5 file fname.
+
+	names -- Names of the elements (the columns of each snapshot).
+	'''
+	def __init__(self, fname, nstars, names, nbuf=64, compression='gzip'):
+		SeriesWriter.__init__(self, fname, [('t', ()), ('elems', (nstars, len(names)))], nbuf=nbuf, compression=compression)
+		self.f['elems'].attrs['names']=np.array(names, dtype='S')
+
+	def append(self, t, elems):
+		'''
+		Add the snapshot at time t; elems has one row per star and one column per element.
+		'''
+		SeriesWriter.append(self, {'t':t, 'elems':elems})
+
+
+def read_elems(fname, snaps=slice(None), stars=slice(None), names=None):
+	'''
+	Read elements from a file written by ElemWriter.
+
+	snaps, stars -- Snapshots and stars to read (index, slice or increasing list of indices).
+	names -- Elements to read (default all).
+
+	Returns the times of the snapshots and a dictionary of arrays keyed by element name, with the
+	snapshot and star axes selected by snaps and stars. Files with a table per snapshot do not have
+	the times, so they are returned as nan.
+	'''
+	f=h5py.File(fname, 'r')
+	if 'elems' not in f:
+		##Older layout: one table per snapshot (snapshot ii at /ii, or /bin/ii for _vs.h5)
+		group=f['bin'] if 'bin' in f else f
+		nsnaps=len([kk for kk in group.keys() if kk.isdigit()])
+		idx=np.arange(nsnaps)[snaps]
+		tabs=[group[str(ii)][...][stars] for ii in np.atleast_1d(idx)]
+		if names is None:
+			names=list(tabs[0].dtype.names)
+		out=dict([(nn, np.array([tab[nn] for tab in tabs]).reshape(np.shape(idx)+np.shape(tabs[0]))) for nn in names])
+		f.close()
+		return np.nan*np.ones(np.shape(idx)), out
+	dset=f['elems']
+	all_names=[nn.decode() for nn in dset.attrs['names']]
+	if names is None:
+		names=all_names
+	ts=f['t'][snaps]
+	##h5py allows a list index along one axis only
+	if isinstance(snaps, slice) or np.ndim(snaps)==0:
+		elems=dset[snaps, stars]
+	else:
+		elems=dset[snaps][:, stars]
+	f.close()
+	return ts, dict([(nn, elems[..., all_names.index(nn)]) for nn in names])
+
+
+def read_series(fname, fields=None):
+	'''
+	Read fields (default all) from a file written by SeriesWriter into a dictionary of arrays.
+	'''
+	f=h5py.File(fname, 'r')
+	if fields is None:
+		fields=list(f.keys())
+	out=dict([(ff, f[ff][...]) for ff in fields])
+	f.close()
+	return out
@@ -0,0 +1,122 @@
+'''
+Index of the snapshots in a SimulationArchive (version 2) file: the time and byte offset of each
+snapshot, read from the field headers of the blobs without decoding any particles.
+
+The index is cached next to the archive (e.g. archive_snapshots), together with the size and
+fingerprint (archive_digest) of the part of the archive it covers. If the archive has grown
+since (e.g. after restart.py) only the new snapshots are scanned.
+'''
+import os
+import struct
+import hashlib
+import numpy as np
+
+##Layout of the archive (rebound 3.8): a 64 byte header, then for each snapshot a list of fields
+##(struct reb_binary_field: type and size of the data that follows), ending with an END field and
+##a struct reb_simulationarchive_blob.
+HEADER_SIZE=64
+FIELD=struct.Struct('<I4xQ')
+BLOB_SIZE=8
+FIELD_T=0
+FIELD_END=9999
+
+
+def cache_name(sa_name):
+	'''
+	File name of the cached index for the archive sa_name, e.g. archive_snapshots
+	'''
+	return sa_name.replace('.bin', '_snapshots')
+
+
+def archive_digest(sa_name, size):
+	'''
+	Fingerprint for the first size bytes of the archive (md5 of its first and last MB).
+	Restarts only append to the archive, so this does not change when a run is extended.
+	'''
+	##Leave out the trailer of the last snapshot (<=16 bytes); rebound rewrites it when the next one is appended.
+	size=size-16
+	f=open(sa_name, 'rb')
+	digest=hashlib.md5(f.read(min(size, 2**20)))
+	f.seek(max(size-2**20, 0))
+	digest.update(f.read(min(size, 2**20)))
+	f.close()
+	return digest.hexdigest()
+
+
+def scan_headers(sa_name, start=0, t0=None):
+	'''
+	Times and offsets of the complete snapshots in the archive sa_name from byte start on (the
+	start of a snapshot), and the offset of the end of the last one.
+
+	t0 -- Time of the first snapshot, if start>0. Snapshots are stored as differences from the
+	first one, so the time field is missing from those at the same time.
+	'''
+	size=os.path.getsize(sa_name)
+	ts=[]
+	offsets=[]
+	pos=start
+	f=open(sa_name, 'rb')
+	while pos<size:
+		##The first snapshot follows the file header
+		f.seek(pos+HEADER_SIZE if pos==0 else pos)
+		t=t0
+		complete=False
+		while True:
+			head=f.read(FIELD.size)
+			if len(head)<FIELD.size:
+				break
+			ftype,fsize=FIELD.unpack(head)
+			if ftype==FIELD_END:
+				complete=True
+				break
+			if ftype==FIELD_T:
+				t=struct.unpack('<d', f.read(8))[0]
+				fsize-=8
+			f.seek(fsize, 1)
+		end=f.tell()+BLOB_SIZE
+		##Stop at a snapshot that is still being written
+		if not complete or end>size or t is None:
+			break
+		if t0 is None:
+			t0=t
+		ts.append(t)
+		offsets.append(pos)
+		pos=end
+	f.close()
+	return np.array(ts, dtype=float), np.array(offsets, dtype=np.int64), pos
+
+
+def snapshot_times(sa_name):
+	'''
+	Times and byte offsets of all of the snapshots in the archive sa_name (in archive order, so
+	that snapshot i is sa[i]), from the cached index if it is up to date.
+	'''
+	fname=cache_name(sa_name)
+	size=os.path.getsize(sa_name)
+	ts=np.empty(0)
+	offsets=np.empty(0, dtype=np.int64)
+	start=0
+	if os.path.exists(fname):
+		try:
+			f=open(fname)
+			size0,digest0=f.readline().split()[1:]
+			size0=int(size0)
+			rows=np.loadtxt(f, ndmin=2)
+			f.close()
+			if size0<=size and len(rows)>0 and archive_digest(sa_name, size0)==digest0:
+				ts,offsets,start=rows[:,1], rows[:,0].astype(np.int64), size0
+		except (ValueError, IndexError):
+			pass
+	if start==size:
+		return ts, offsets
+
+	ts_new,offsets_new,end=scan_headers(sa_name, start, ts[0] if len(ts)>0 else None)
+	ts=np.concatenate([ts, ts_new])
+	offsets=np.concatenate([offsets, offsets_new])
+	if end>start:
+		f=open(fname, 'w')
+		f.write('# {0} {1}\n'.format(end, archive_digest(sa_name, end)))
+		for oo,tt in zip(offsets, ts):
+			f.write('{0} {1!r}\n'.format(oo, tt))
+		f.close()
+	return ts, offsets
@@ -1,6 +1,6 @@
-from astropy.table import Table
-import matplotlib.pyplot as plt
-import sys
+from rebound_runs.series_store import read_elems
+import rebound
+import argparse
 import numpy as np
 
 from scipy.optimize import curve_fit
@@ -9,18 +9,57 @@ def cum_dist(x, xmin, xmax, p):
     return (x**(1-p)-xmin**(1-p))/(xmax**(1-p)-xmin**(1-p))
 
 
-elem='a'
-names=np.genfromtxt('names', dtype=str)
+def stack(names, elem, snaps):
+	'''
+	Pool the values of elem from all of the runs (one read per run): array with one row per
+	snapshot in snaps, and the stars of all of the runs along the columns.
+	'''
+	elems=[read_elems(name.replace('.bin', '_elems.hdf5'), snaps=snaps, names=[elem])[1][elem] for name in names]
+	##Only the snapshots present in every run
+	nsnap=min([len(ee) for ee in elems])
+	return np.concatenate([ee[:nsnap] for ee in elems], axis=1)
 
-f=open('pfit', 'w')
-for ii in range(0, 4994, 10):
-	elem_list=np.concatenate([Table.read(name.replace('.bin', '_elems.hdf5'), '/{0}'.format(ii))[elem] for name in names])
+
+def fit_snap(args):
+	'''
+	Fit cum_dist to the distribution of the positive values in elem_list; args is
+	(elem_list, file name for the values).
+	'''
+	elem_list,fname=args
 	elem_list=elem_list[elem_list>0]
-	np.savetxt('a_list_{0}.txt'.format(ii), elem_list)
+	np.savetxt(fname, elem_list)
 
 	xx=np.sort(elem_list)
 	yy=(np.array(range(len(xx)))).astype(float)/float(len(xx))
 	popt,pcov=curve_fit(cum_dist, xx, yy, [1., 2., 1.1])
-	f.write('{0} {1} {2} {3}\n'.format(ii, popt[0], popt[1], popt[2]))
+	return popt
+
+
+def main():
+	parser=argparse.ArgumentParser(description='Fit the distribution of an orbital element across runs at each snapshot')
+	parser.add_argument('-n', '--names', default='names', help='File with the names of the runs (simulation archives)')
+	parser.add_argument('-e', '--elem', default='a', help='Orbital element to fit')
+	parser.add_argument('--start', type=int, default=0, help='First snapshot')
+	parser.add_argument('--stop', type=int, default=4994, help='End of the snapshot range (exclusive)')
+	parser.add_argument('-s', '--stride', type=int, default=10, help='Stride between snapshots')
+	parser.add_argument('-p', '--nproc', type=int, default=None, help='Number of processes for the fits (default number of cpus)')
+	args=parser.parse_args()
+
+	names=np.atleast_1d(np.genfromtxt(args.names, dtype=str))
+	pools=stack(names, args.elem, slice(args.start, args.stop, args.stride))
+	snaps=range(args.start, args.stop, args.stride)[:len(pools)]
+
+	pool=rebound.InterruptiblePool(processes=args.nproc)
+	##map keeps the order of the snapshots
+	popts=pool.map(fit_snap, [(pools[jj], '{0}_list_{1}.txt'.format(args.elem, ii)) for jj,ii in enumerate(snaps)])
+	pool.close()
+	pool.join()
+
+	f=open('pfit', 'w')
+	for ii,popt in zip(snaps, popts):
+		f.write('{0} {1} {2} {3}\n'.format(ii, popt[0], popt[1], popt[2]))
+	f.close()
+
 
-f.close()
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,61 @@
+'''
+Logging of tidal disruption events (collisions between a star and the SMBH, particle 0).
+'''
+import atexit
+import weakref
+
+##Number of events held in memory before they are written out
+TDE_BUFFER=1000
+##Logs that are still open; they are closed by a single exit hook.
+OPEN_LOGS=weakref.WeakSet()
+
+
+def close_all():
+	'''
+	Close all open TDE logs, writing out their buffered events.
+	'''
+	for log in list(OPEN_LOGS):
+		log.close()
+atexit.register(close_all)
+
+
+class TDELog(object):
+	'''
+	Collision callback that records TDEs. Set sim.collision_resolve to the instance; star-star
+	collisions are ignored, and for each star-SMBH collision a line
+
+	t a e idx TDE!
+
+	is added to the log fname, with the orbit of the star (idx) around the SMBH. Lines are buffered
+	and written by flush (call it at each snapshot), when the buffer is full, and on exit.
+	'''
+	def __init__(self, fname, nbuf=TDE_BUFFER):
+		self.f=open(fname, 'a+')
+		self.nbuf=nbuf
+		self.lines=[]
+		OPEN_LOGS.add(self)
+
+	def __call__(self, sim, reb_coll):
+		p1,p2=reb_coll.p1, reb_coll.p2
+		if min(p1, p2)!=0:
+			return 0
+		idx=max(p1, p2)
+		ps=sim[0].particles
+		orbit=ps[idx].calculate_orbit(primary=ps[0])
+		self.lines.append('{0} {1} {2} {3} TDE!\n'.format(sim[0].t, orbit.a, orbit.e, idx))
+		if len(self.lines)>=self.nbuf:
+			self.flush()
+		##Keep both particles
+		return 0
+
+	def flush(self):
+		if self.f.closed:
+			return
+		self.f.writelines(self.lines)
+		self.f.flush()
+		self.lines=[]
+
+	def close(self):
+		self.flush()
+		self.f.close()
+		OPEN_LOGS.discard(self)
@@ -0,0 +1,206 @@
+import sys
+sys.path.append('/usr/local/lib/python2.7/dist-packages/')
+import rebound
+from rebound_runs import bin_analysis, neighbors, accel
+import numpy as np
+from itertools import combinations
+import os
+import tempfile
+from ctypes import byref
+
+np.random.seed(0)
+sim2 = rebound.Simulation()
+sim2.G = 1.
+sim2.add(m = 1.) # SMBH
+for ii in range(20):
+	sim2.add(m = 1.0e-4, a=np.random.uniform(1., 1.2), inc=0.01*np.random.random(), M=2.*np.pi*np.random.random(), primary=sim2.particles[0])
+	if ii%5==0:
+		sim2.add(m = 1.0e-4, a=3.0e-3, e=0.1, primary=sim2.particles[-1]) #Companion
+sim2.move_to_com()
+sim2.integrate(1.0e-3)
+
+def bin_find_loop(sim):
+	ps = sim.particles
+	m0 = ps[0].m
+	bin_indics=[]
+	for i1, i2 in combinations(range(1, sim.N),2):
+		com_d, a_bin, e_bin, p1_com, p2_com, d2, inc, ft = bin_analysis.bin_props(ps[i1], ps[i2])
+		m1,m2 =ps[i1].m, ps[i2].m
+		rh=((m1+m2)/m0)**(1./3.)*com_d
+		if ((a_bin>0) and (a_bin<rh) and (m1*m2/d2>ft)):
+			bin_indics.append([sim.t, i1, i2, d2**0.5, a_bin, a_bin/rh, e_bin, rh, rh*(m0/com_d**3.)**0.5])
+	return np.array(bin_indics)
+
+def test_bin_find_arr():
+	bins=bin_analysis.bin_find_sim(sim2)
+	bins2=bin_find_loop(sim2)
+	assert len(bins)==3
+	assert np.all(bins[:,[1,2]]==bins2[:,[1,2]])
+	assert np.allclose(bins, bins2, rtol=1.0e-12, atol=0.)
+
+def test_grav_acc():
+	##Same accelerations as rebound's basic gravity
+	sim=sim2.copy()
+	sim.softening=1.0e-3
+	rebound.clibrebound.reb_update_acceleration(byref(sim))
+	xyz, vxyz, axyz, ms=bin_analysis.sim_arrays(sim)
+	acc=accel.grav_acc(xyz, ms, G=sim.G, softening=sim.softening, block=50)
+	assert np.allclose(acc, axyz, rtol=1.0e-12, atol=0.)
+	assert np.all(accel.grav_acc(xyz, ms, idx=[3, 1], softening=sim.softening)==acc[[3, 1]])
+
+def test_bin_find_arr_block():
+	##Results should not depend on how the pairs are chunked
+	xyz, vxyz, axyz, ms=bin_analysis.sim_arrays(sim2)
+	bins=bin_analysis.bin_find_arr(sim2.t, xyz, vxyz, axyz, ms)
+	bins2=bin_analysis.bin_find_arr(sim2.t, xyz, vxyz, axyz, ms, block=7)
+	assert np.all(bins==bins2)
+
+def test_bin_find_prune():
+	##Neighbor search should not change the binaries that are found
+	xyz, vxyz, axyz, ms=bin_analysis.sim_arrays(sim2)
+	pairs=neighbors.cand_pairs(xyz, neighbors.hill_reach(xyz, ms))
+	bins=bin_analysis.bin_find_arr(sim2.t, xyz, vxyz, axyz, ms, pairs=pairs)
+	bins2=bin_analysis.bin_find_arr(sim2.t, xyz, vxyz, axyz, ms)
+	assert len(pairs[0])<len(ms)**2/10
+	assert np.all(bins==bins2)
+
+def test_bin_find_smbh_only():
+	##A simulation with no stars has no binaries
+	sim=rebound.Simulation()
+	sim.add(m=1.)
+	xyz, vxyz, axyz, ms=bin_analysis.sim_arrays(sim)
+	reach=neighbors.hill_reach(xyz, ms)
+	assert np.all(reach==0)
+	pairs=neighbors.cand_pairs(xyz, reach)
+	assert len(pairs[0])==0
+	assert len(bin_analysis.bin_find_arr(sim.t, xyz, vxyz, axyz, ms, pairs=pairs))==0
+
+def test_neighbor_list():
+	##Candidate lists carried across snapshots should give the same binaries as a fresh search
+	sim3=sim2.copy()
+	nlist=neighbors.NeighborList(skin=0.02)
+	for tt in np.linspace(1.0e-3, 0.05, 10):
+		sim3.integrate(tt)
+		xyz, vxyz, axyz, ms=bin_analysis.sim_arrays(sim3)
+		pairs=nlist.pairs(sim3.t, xyz, vxyz, ms)
+		bins=bin_analysis.bin_find_arr(sim3.t, xyz, vxyz, axyz, ms, pairs=pairs)
+		bins2=bin_analysis.bin_find_arr(sim3.t, xyz, vxyz, axyz, ms)
+		assert np.all(bins==bins2)
+	assert nlist.nbuild<10
+
+def test_pair_index():
+	i1=np.array([3, 1, 2, 1, 3])
+	i2=np.array([1, 3, 5, 2, 1])
+	keys=bin_analysis.pair_key(i1, i2)
+	assert np.array_equal(bin_analysis.key_pair(keys)[0], np.minimum(i1, i2))
+	assert np.array_equal(bin_analysis.key_pair(keys)[1], np.maximum(i1, i2))
+	keys_u,inv=np.unique(keys, return_inverse=True)
+	ptr,rows=bin_analysis.csr_index(inv, len(keys_u))
+	for jj,kk in enumerate(keys_u):
+		assert np.array_equal(rows[ptr[jj]:ptr[jj+1]], np.where(keys==kk)[0])
+
+def test_snapshot_index():
+	fname=os.path.join(tempfile.mkdtemp(), 'sim.bin')
+	sim=sim2.copy()
+	sim.t=0.
+	sim.integrator='leapfrog'
+	sim.dt=1.0e-3
+	sim.automateSimulationArchive(fname, interval=0.1, deletefile=True)
+	sim.integrate(0.55)
+	##Duplicate snapshot, as left by a restart.
+	sim=rebound.Simulation(fname)
+	sim.simulationarchive_snapshot(fname)
+	sim.dt=1.0e-3
+	sim.automateSimulationArchive(fname, interval=0.1, deletefile=False)
+	sim.integrate(0.75)
+	sa=rebound.SimulationArchive(fname)
+	blobs,ts,cadence=bin_analysis.snapshot_index(sa)
+	assert len(ts)==len(np.unique(np.array(sa.t[:len(sa)])))<len(sa)
+	assert np.all(np.diff(ts)>0)
+	assert np.all(np.array([sa[int(bb)].t for bb in blobs])==ts)
+	assert np.isclose(cadence, 0.1, rtol=0.05)
+	blobs,ts,cadence=bin_analysis.snapshot_index(sa, interval=0.2)
+	assert np.isclose(cadence, 0.2, rtol=0.05)
+
+def test_bin_strip():
+	##Same stars removed as by deleting binaries and searching again until none are left
+	sim=sim2.copy()
+	orig=np.arange(sim.N)
+	bins=bin_analysis.bin_find_sim(sim)
+	while len(bins)>0:
+		to_del=np.unique(bins[:,1]).astype(int)
+		for idx in to_del[::-1]:
+			sim.remove(int(idx))
+		orig=np.delete(orig, to_del)
+		bins=bin_analysis.bin_find_sim(sim)
+	for local in [False, True]:
+		removed=bin_analysis.bin_strip_idx(sim2, local=local)
+		assert np.array_equal(np.setdiff1d(np.arange(sim2.N), removed), orig)
+	sim3=sim2.copy()
+	bin_analysis.bin_strip(sim3)
+	assert len(bin_analysis.bin_find_sim(sim3))==0
+
+def test_bin_find_iter():
+	##Snapshots are analyzed one at a time, with the same results as a fresh search in each
+	fname=os.path.join(tempfile.mkdtemp(), 'sim.bin')
+	sim=sim2.copy()
+	sim.t=0.
+	sim.integrator='leapfrog'
+	sim.dt=1.0e-3
+	sim.automateSimulationArchive(fname, interval=0.1, deletefile=True)
+	sim.integrate(0.55)
+	sa=rebound.SimulationArchive(fname)
+	blobs,ts,cadence=bin_analysis.snapshot_index(sa)
+	bins=bin_analysis.bin_find_iter(fname, blobs)
+	assert not isinstance(bins, list)
+	for bb,bins_snap in zip(blobs, bins):
+		assert np.array_equal(bins_snap, bin_analysis.bin_find_sim(sa[int(bb)]))
+	bins1=bin_analysis.BinAnalysis(fname, interval=None).bins
+	os.remove(fname.replace('.bin', '_bins.bst'))
+	os.remove(fname.replace('.bin', '_bins.csv'))
+	assert np.array_equal(bin_analysis.BinAnalysis(fname, nproc=2, interval=None).bins, bins1)
+
+def test_bin_tables_interrupted():
+	##An analysis that stops partway leaves tables that are regenerated or completed, not loaded as they are
+	fname=os.path.join(tempfile.mkdtemp(), 'sim.bin')
+	sim=sim2.copy()
+	sim.t=0.
+	sim.integrator='leapfrog'
+	sim.dt=1.0e-3
+	sim.automateSimulationArchive(fname, interval=0.1, deletefile=True)
+	sim.integrate(0.55)
+	add=bin_analysis.BinTables.add
+	def add_fail(self, bins, calls=[]):
+		calls.append(1)
+		if len(calls)>3:
+			raise RuntimeError('stop')
+		add(self, bins)
+	bin_analysis.BinTables.add=add_fail
+	try:
+		bin_analysis.BinAnalysis(fname, interval=None)
+	except RuntimeError:
+		pass
+	bin_analysis.BinTables.add=add
+	assert not os.path.exists(fname.replace('.bin', '_times'))
+	bins=bin_analysis.BinAnalysis(fname, interval=None)
+	assert len(bins.ts)==6
+
+	##The same for snapshots added after a restart
+	sim.integrate(1.25)
+	calls=[1, 1]
+	bin_analysis.BinTables.add=lambda self, bins: add_fail(self, bins, calls)
+	try:
+		bin_analysis.BinAnalysis(fname, interval=None)
+	except RuntimeError:
+		pass
+	bin_analysis.BinTables.add=add
+	bins=bin_analysis.BinAnalysis(fname, interval=None)
+	os.remove(fname.replace('.bin', '_bins_meta'))
+	os.remove(fname.replace('.bin', '_bins.bst'))
+	os.remove(fname.replace('.bin', '_bins.csv'))
+	bins_new=bin_analysis.BinAnalysis(fname, interval=None)
+	assert len(bins.ts)==13
+	assert np.array_equal(bins.bins, bins_new.bins)
+	##The bin table is memory mapped from the store, not copied
+	assert isinstance(bins.rec, np.memmap)
+	assert isinstance(bin_analysis.BinAnalysis(fname, interval=None).rec, np.memmap)
@@ -0,0 +1,24 @@
+from rebound_runs import bin_store
+import numpy as np
+import os
+import tempfile
+
+def test_bin_store():
+	fname=os.path.join(tempfile.mkdtemp(), 'sim_bins.bst')
+	bins=np.random.random([10, 9])
+	bins[:,1]=np.arange(1, 11)
+	bins[:,2]=np.arange(2, 12)
+	bin_store.write_table(fname, bins[:4], 'bins')
+	bin_store.append_table(fname, bins[4:], 'bins')
+	recs=bin_store.read_table(fname, 'bins')
+	assert recs['i1'].dtype==np.int32
+	assert np.array_equal(bin_store.from_records(recs), bins)
+
+	bin_store.write_table(fname, np.empty([0, 9]), 'bins')
+	assert bin_store.from_records(bin_store.read_table(fname, 'bins')).shape==(0, 9)
+	try:
+		bin_store.read_table(fname, 'times')
+	except ValueError:
+		pass
+	else:
+		assert False
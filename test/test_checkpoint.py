@@ -0,0 +1,38 @@
+import sys
+sys.path.append('/usr/local/lib/python2.7/dist-packages/')
+import os
+import tempfile
+import rebound
+from rebound_runs import checkpoint
+import numpy as np
+
+def test_checkpoint_stream():
+	np.random.seed(0)
+	sim=rebound.Simulation()
+	sim.add(m=1.)
+	for ii in range(20):
+		sim.add(m=1.0e-5, a=np.random.uniform(1., 2.), M=2.*np.pi*np.random.random(), primary=sim.particles[0])
+	sim.move_to_com()
+	sim.integrator='leapfrog'
+	sim.dt=1.0e-3
+	fname=os.path.join(tempfile.mkdtemp(), 'run_ckpt.bin')
+	checkpoints=checkpoint.CheckpointStream(fname, keep_last=2, keep_every=2.)
+	for step in range(12):
+		sim.integrate(0.5*(step+1))
+		checkpoints.save(sim, step)
+		##Index agrees with the archive
+		idx=checkpoint.read_index(fname)
+		sa=rebound.SimulationArchive(fname)
+		assert np.array_equal(np.arange(len(sa)), idx[:,2])
+		assert np.array_equal(np.array(sa.t[:len(sa)]), idx[:,1])
+	##Last two, plus the first in each interval of length 2 (others are dropped in batches of keep_last)
+	assert np.array_equal(idx[:,0], [0, 3, 7, 9, 10, 11])
+	sim2,step=checkpoint.load_latest(fname)
+	assert step==11
+	assert np.array_equal([pp.xyz for pp in sim2.particles], [pp.xyz for pp in sim.particles])
+	##Restart from the latest checkpoint and keep adding to the same archive
+	checkpoints=checkpoint.CheckpointStream(fname, keep_last=2, keep_every=2., append=True)
+	sim2.integrate(6.5)
+	checkpoints.save(sim2, 12)
+	assert np.array_equal(checkpoint.read_index(fname)[:,0], [0, 3, 7, 11, 12])
+	assert checkpoint.load_latest(fname)[1]==12
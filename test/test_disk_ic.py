@@ -0,0 +1,58 @@
+import sys
+sys.path.append('/usr/local/lib/python2.7/dist-packages/')
+import rebound
+from rebound_runs import disk_ic
+import numpy as np
+from scipy.stats import kstest
+
+@np.vectorize
+def cum_dist(x):
+	if x<1:
+		return 0.
+	elif x>=2:
+		return 1.
+	else:
+		return (1.-1./x)/(1.-1./2.)
+
+def test_density():
+	rng=np.random.RandomState(0)
+	aa=disk_ic.density(1., 2., 2., 1000, rng)
+	assert kstest(aa, cum_dist).pvalue>0.05
+	##Explicit seeds reproduce the draws
+	assert np.array_equal(disk_ic.density(1., 2., 1., 10, np.random.RandomState(3)), disk_ic.density(1., 2., 1., 10, np.random.RandomState(3)))
+
+def test_gen_disk():
+	##Same angles as rotating one star at a time
+	ang=0.05
+	rng=np.random.RandomState(1)
+	inc, Omega, omega=disk_ic.gen_disk(ang, 50, rng)
+	rng=np.random.RandomState(1)
+	angles=np.array([rng.normal(0., ang, 50) for ii in range(3)]).T
+	ehat, jhat=np.array([1., 0., 0.]), np.array([0., 0., 1.])
+	bhat=np.cross(jhat, ehat)
+	rot=lambda angle, axis, vec: vec*np.cos(angle)+np.cross(axis, vec)*np.sin(angle)+axis*np.dot(axis, vec)*(1.-np.cos(angle))
+	for kk,(a1, a2, a3) in enumerate(angles):
+		jj=rot(a2, bhat, rot(a1, ehat, jhat))
+		ee=rot(a3, jj, rot(a2, bhat, ehat))
+		assert np.isclose(inc[kk], np.arccos(jj[2]), rtol=1.0e-12, atol=0.)
+		nn=np.cross([0., 0., 1.], jj)
+		nn=nn/np.linalg.norm(nn)
+		assert np.isclose(Omega[kk], np.arctan2(nn[1], nn[0]), rtol=1.0e-12, atol=0.)
+		assert np.isclose(omega[kk], np.arccos(np.dot(nn, ee)) if ee[2]>=0 else 2.*np.pi-np.arccos(np.dot(nn, ee)), rtol=1.0e-12, atol=0.)
+
+def test_add_orbits():
+	##Same particles as adding the stars one at a time with orbital elements
+	rng=np.random.RandomState(2)
+	aa=disk_ic.density(1., 2., 1., 100, rng)
+	inc, Omega, omega=disk_ic.gen_disk(0.05, 100, rng)
+	MM=rng.uniform(0., 2.*np.pi, 100)
+	sim=rebound.Simulation()
+	sim.add(m=1., r=1.0e-4)
+	for jj in range(100):
+		sim.add(m=5.0e-5, a=aa[jj], e=0.7, inc=inc[jj], Omega=Omega[jj], omega=omega[jj], M=MM[jj], primary=sim.particles[0])
+	sim2=rebound.Simulation()
+	sim2.add(m=1., r=1.0e-4)
+	disk_ic.add_orbits(sim2, 5.0e-5, aa, 0.7, inc, Omega, omega, MM)
+	assert sim2.N==sim.N
+	assert np.array_equal([pp.m for pp in sim2.particles], [pp.m for pp in sim.particles])
+	assert np.allclose([pp.xyz+pp.vxyz for pp in sim2.particles], [pp.xyz+pp.vxyz for pp in sim.particles], rtol=0., atol=1.0e-13)
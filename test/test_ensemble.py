@@ -0,0 +1,86 @@
+import rebound
+from rebound_runs import bin_store, ensemble, scan
+import numpy as np
+import os
+import tempfile
+
+def fake_run(name, ts, rng):
+	##Bin tables as written by BinAnalysis, and velocity dispersions as written by bin_script.py
+	ms=np.array([1., 1., 2., 2., 1., 2.])*1.0e-5
+	bins=[]
+	for tt in ts:
+		for i1,i2 in [(1, 2), (3, 4), (2, 6), (1, 5)]:
+			if rng.random_sample()<0.5:
+				bins.append([tt, i1, i2, 0., 0., 0., 0., 0., 0.])
+	bin_store.write_table(bin_store.store_name(name, 'bins'), np.array(bins).reshape([-1, 9]), 'bins')
+	bin_store.write_table(bin_store.store_name(name, 'times'), ts, 'times')
+	bin_store.write_table(bin_store.store_name(name, 'masses'), ms, 'masses')
+	for extra in ['_sigs', '_sigs_low', '_sigs_high']:
+		np.savetxt(name.replace('.bin', extra), rng.random_sample([len(ts), 3]))
+	return np.array(bins)
+
+def test_ensemble():
+	rng=np.random.RandomState(0)
+	base=tempfile.mkdtemp()
+	names=[os.path.join(base, 'run{0}.bin'.format(ii)) for ii in range(3)]
+	ts=0.2*np.pi*np.arange(20)
+	bins=[fake_run(name, ts, rng) for name in names]
+	##Too short, so it is skipped
+	fake_run(os.path.join(base, 'short.bin'), ts[:5], rng)
+
+	t_std=ts[:-1]+0.1
+	nruns,nums,err,nums_analytic,err_analytic=ensemble.ensemble(names+[os.path.join(base, 'short.bin')], 'light', t_std, nproc=2)
+	assert nruns==3
+	##Light pairs are (1, 2) and (1, 5)
+	counts=[np.interp(t_std, ts, [np.sum((bb[:,0]==tt) & (bb[:,1]==1)) for tt in ts]) for bb in bins]
+	assert np.allclose(nums, np.mean(counts, axis=0))
+	##Analytic estimate for each run (3 light stars), then the median over runs
+	analytic=[np.interp(t_std, ts, ensemble.num_analytic(3., np.genfromtxt(name.replace('.bin', '_sigs_low'))[:,2])) for name in names]
+	assert np.allclose(nums_analytic, np.median(analytic, axis=0))
+	assert np.allclose(err_analytic, np.std(analytic, axis=0, ddof=1)/np.sqrt(3.))
+	assert os.path.exists(bin_store.store_name(names[0], 'summary'))
+
+	##Summaries are reused, and regenerated when the dispersions change
+	summ=ensemble.run_summary(names[0])
+	assert np.array_equal(summ['n_mixed'], [np.sum((bins[0][:,0]==tt) & (bins[0][:,1]==2)) for tt in ts])
+	np.savetxt(names[0].replace('.bin', '_sigs'), np.ones([len(ts), 3]))
+	os.utime(names[0].replace('.bin', '_sigs'), (0, os.path.getmtime(bin_store.store_name(names[0], 'summary'))+10))
+	assert np.all(ensemble.run_summary(names[0])['sig_all']==1.)
+
+def test_run_summary_single():
+	##A run with a single snapshot, from the text tables (so _times reads back as a scalar)
+	rng=np.random.RandomState(1)
+	name=os.path.join(tempfile.mkdtemp(), 'run.bin')
+	bins=fake_run(name, np.array([0.]), rng)
+	for table,ext in [('bins', '_bins.csv'), ('times', '_times'), ('masses', '_masses')]:
+		fname=bin_store.store_name(name, table)
+		np.savetxt(name.replace('.bin', ext), bin_store.from_records(bin_store.read_table(fname, table)), delimiter=',')
+		os.remove(fname)
+	summ=ensemble.run_summary(name)
+	assert len(summ)==1
+	assert summ['n_all'][0]==len(bins)
+
+def test_run_summary_cadence():
+	##Snapshots every 0.1 (and a duplicate left by a restart), while the bin table has one every 0.2 pi:
+	##the dispersions are those of the snapshots in the table.
+	name=os.path.join(tempfile.mkdtemp(), 'sim.bin')
+	rng=np.random.RandomState(2)
+	sim=rebound.Simulation()
+	sim.add(m=1.)
+	for ii in range(12):
+		sim.add(m=1.0e-4*(1+ii%2), a=rng.uniform(1., 1.2), inc=0.1*rng.random_sample(), M=2.*np.pi*rng.random_sample(), primary=sim.particles[0])
+	sim.move_to_com()
+	sim.integrator='leapfrog'
+	sim.dt=1.0e-3
+	sim.automateSimulationArchive(name, interval=0.1, deletefile=True)
+	sim.integrate(0.35)
+	sim.simulationarchive_snapshot(name)
+	sim.integrate(1.35)
+	scan.scan(name)
+	summ=ensemble.run_summary(name)
+	assert np.allclose(summ['t'], [0., 0.6, 1.2], atol=2.0e-3)
+	sa=rebound.SimulationArchive(name)
+	sigs=np.genfromtxt(name.replace('.bin', '_sigs'))[:,2]
+	for tt,sig in zip(summ['t'], summ['sig_all']):
+		assert sig==sigs[np.where(np.array(sa.t[:len(sa)])==tt)[0][-1]]
+	assert not np.allclose(summ['sig_all'], sigs[:3])
@@ -0,0 +1,29 @@
+import matplotlib
+matplotlib.use('Agg')
+from rebound_runs import bin_analysis, bin_store
+import numpy as np
+import os
+import tempfile
+
+def test_exotica():
+	sa_name=os.path.join(tempfile.mkdtemp(), 'sim.bin')
+	ts=np.arange(1, 11)*0.2*np.pi
+	rows=[]
+	##1-2 exchanged for 1-3 at snapshot 3; 4 is in a triple at snapshot 2.
+	for i1,i2,snaps in [(1, 2, [0, 1, 2]), (1, 3, [3, 4]), (4, 5, [0, 1, 2]), (4, 6, [2])]:
+		for ss in snaps:
+			rows.append([ts[ss], i1, i2, 1.0e-3, 1.0e-3, 0.5, 0.1, 2.0e-3, 1.0e-3])
+	rows=sorted(rows, key=lambda rr:rr[0])
+	np.savetxt(sa_name.replace('.bin', '_bins.csv'), rows, delimiter=',')
+	np.savetxt(sa_name.replace('.bin', '_times'), ts)
+	np.savetxt(sa_name.replace('.bin', '_masses'), np.ones(6)*1.0e-5)
+
+	bins=bin_analysis.BinAnalysis(sa_name)
+	events=bins.exotica(verbose=False, save=True)
+	assert len(events)==2
+	assert list(events['kind'])==[bin_analysis.EXCHANGE, bin_analysis.TRIPLE]
+	assert (events[0]['star'], events[0]['old'], events[0]['new'])==(1, 2, 3)
+	assert np.isclose(events[0]['t'], ts[3])
+	assert (events[1]['star'], events[1]['nbound'])==(4, 3)
+	saved=bin_store.read_table(bin_store.store_name(sa_name, 'events'), 'events')
+	assert np.array_equal(saved, events)
@@ -0,0 +1,44 @@
+from rebound_runs import jobs
+import numpy as np
+import os
+import tempfile
+import time
+from collections import OrderedDict
+
+def write_a(name):
+	open(name.replace('.bin', '_a'), 'w').write(open(name).read())
+
+def write_b(name):
+	if 'bad' in name:
+		raise ValueError('bad archive')
+	open(name.replace('.bin', '_b'), 'w').write(open(name.replace('.bin', '_a')).read()+'b')
+
+def write_c(name):
+	open(name.replace('.bin', '_c'), 'w').write('c')
+
+def test_jobs():
+	base=tempfile.mkdtemp()
+	names=[os.path.join(base, nn) for nn in ['run0.bin', 'run1.bin', 'bad.bin']]
+	for nn in names:
+		open(nn, 'w').write(nn)
+	tasks=jobs.TASKS
+	jobs.TASKS=OrderedDict([('a', {'func':write_a, 'outputs':['_a'], 'deps':[]}),\
+		('b', {'func':write_b, 'outputs':['_b'], 'deps':['a']}),\
+		('c', {'func':write_c, 'outputs':['_c'], 'deps':['b']})])
+	try:
+		status=jobs.run(names, nproc=2)
+		assert status[('b', names[0])]=='done' and status[('c', names[1])]=='done'
+		assert status[('b', names[2])]=='failed' and status[('c', names[2])]=='blocked'
+		assert open(names[1].replace('.bin', '_b')).read()==names[1]+'b'
+		##b and the task it depends on, for the good archives only
+		status=jobs.run(names[:2], ['b'])
+		assert set(status.keys())==set([(tt, nn) for tt in ['a', 'b'] for nn in names[:2]])
+		assert all([ss=='skipped' for ss in status.values()])
+		##Everything downstream of a changed input is redone
+		time.sleep(0.01)
+		os.utime(names[0].replace('.bin', '_a'), None)
+		status=jobs.run(names[:2])
+		assert [status[(tt, names[0])] for tt in ['a', 'b', 'c']]==['skipped', 'done', 'done']
+		assert all([status[(tt, names[1])]=='skipped' for tt in ['a', 'b', 'c']])
+	finally:
+		jobs.TASKS=tasks
@@ -0,0 +1,23 @@
+import sys
+sys.path.append('/usr/local/lib/python2.7/dist-packages/')
+import rebound
+from rebound_runs import kepler
+import numpy as np
+
+def test_orbit_elements():
+	##Same elements as rebound, including planar, retrograde, circular and unbound orbits
+	np.random.seed(1)
+	sim=rebound.Simulation()
+	sim.add(m=1.)
+	for ii in range(200):
+		inc=[0., 1.0e-9, np.pi, np.random.uniform(0., np.pi)][ii%4]
+		e=[0., 0.3, 1.5, np.random.random()][(ii//4)%4]
+		a=-1. if e>1 else np.random.uniform(1., 2.)
+		f=np.random.uniform(-0.5, 0.5) if e>1 else np.random.uniform(-np.pi, np.pi)
+		sim.add(m=1.0e-5*np.random.random(), a=a, e=e, inc=inc, Omega=np.random.uniform(0., 2.*np.pi),\
+			omega=np.random.uniform(0., 2.*np.pi), f=f, primary=sim.particles[0])
+	sim.move_to_com()
+	orbits=sim.calculate_orbits(primary=sim.particles[0])
+	elems=kepler.sim_elements(sim)
+	for kk,nn in enumerate(kepler.ELEMENTS):
+		assert np.allclose(elems[:,kk], [getattr(oo, nn) for oo in orbits], rtol=1.0e-12, atol=1.0e-12)
@@ -0,0 +1,61 @@
+import rebound
+from rebound_runs import scan, bin_analysis, series_store
+import numpy as np
+import os
+import shutil
+import tempfile
+
+def test_scan():
+	##Same outputs as the separate passes over the archive
+	base=tempfile.mkdtemp()
+	name=os.path.join(base, 'sim.bin')
+	np.random.seed(1)
+	sim=rebound.Simulation()
+	sim.add(m=1.)
+	for ii in range(20):
+		sim.add(m=1.0e-4*(1+ii%2), a=np.random.uniform(1., 1.2), inc=0.01*np.random.random(), M=2.*np.pi*np.random.random(), primary=sim.particles[0])
+		if ii%5==0:
+			sim.add(m=1.0e-4, a=3.0e-3, e=0.1, primary=sim.particles[-1])
+	sim.move_to_com()
+	sim.integrator='leapfrog'
+	sim.dt=1.0e-3
+	sim.automateSimulationArchive(name, interval=0.1, deletefile=True)
+	sim.integrate(0.55)
+	os.mkdir(os.path.join(base, 'ref'))
+	ref=os.path.join(base, 'ref', 'sim.bin')
+	shutil.copy(name, ref)
+
+	scan.scan(name)
+	sa=rebound.SimulationArchive(ref)
+	bins=bin_analysis.BinAnalysis(ref, interval=0.2*np.pi)
+	for ff in ['_bins.csv', '_times', '_masses']:
+		assert open(name.replace('.bin', ff)).read()==open(ref.replace('.bin', ff)).read()
+	assert len(bins.bins)>0
+	ts,elems=series_store.read_elems(name.replace('.bin', '_elems.hdf5'), snaps=3)
+	snap=sa[3]
+	assert ts==snap.t
+	assert np.array_equal(elems['e'], [pp.e for pp in snap.calculate_orbits(primary=snap.particles[0])])
+	snap=sa[2]
+	vs=np.array([pp.vxyz for pp in snap.particles[1:]])
+	ms=np.array([pp.m for pp in snap.particles[1:]])
+	assert np.allclose(np.genfromtxt(name.replace('.bin', '_sigs_low'))[2], np.std(vs[ms<=np.median(ms)], axis=0), rtol=1.0e-12, atol=0.)
+
+	##After the run is extended, only the new snapshots are analyzed for the bin table
+	sim.integrate(2.)
+	os.mkdir(os.path.join(base, 'ref2'))
+	ref2=os.path.join(base, 'ref2', 'sim.bin')
+	shutil.copy(name, ref2)
+	bin_find_sim=bin_analysis.bin_find_sim
+	calls=[]
+	def bin_find_count(sim, nlist=None):
+		calls.append(sim.t)
+		return bin_find_sim(sim, nlist=nlist)
+	bin_analysis.bin_find_sim=bin_find_count
+	try:
+		scan.scan(name, ['bins'])
+	finally:
+		bin_analysis.bin_find_sim=bin_find_sim
+	assert len(calls)==3
+	bins=bin_analysis.BinAnalysis(ref2, interval=0.2*np.pi)
+	for ff in ['_bins.csv', '_times', '_masses']:
+		assert open(name.replace('.bin', ff)).read()==open(ref2.replace('.bin', ff)).read()
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import h5py
+from rebound_runs import series_store
+import numpy as np
+
+def test_series_writer():
+	##Appending through a small buffer should give back every output in order
+	fname=os.path.join(tempfile.mkdtemp(), 'orbits.h5')
+	writer=series_store.SeriesWriter(fname, [('t', ()), ('x', (5,))], nbuf=3)
+	xs=np.random.random([8, 5])
+	for ii in range(8):
+		writer.append({'t':0.1*ii, 'x':xs[ii]})
+		if ii==4:
+			writer.flush()
+	writer.close()
+	out=series_store.read_series(fname)
+	assert np.array_equal(out['x'], xs)
+	assert np.allclose(out['t'], 0.1*np.arange(8))
+	assert series_store.read_series(fname, ['t']).keys()==['t']
+	##Restart after output 5: later outputs are replaced
+	writer=series_store.SeriesWriter(fname, [('t', ()), ('x', (5,))], nbuf=3, start=5)
+	writer.append({'t':-1., 'x':xs[0]})
+	writer.close()
+	out=series_store.read_series(fname)
+	assert np.array_equal(out['x'], np.vstack([xs[:5], xs[:1]]))
+
+def test_elem_writer():
+	##Slices by snapshot and by star of the (snapshot, star, element) dataset
+	fname=os.path.join(tempfile.mkdtemp(), 'elems.hdf5')
+	writer=series_store.ElemWriter(fname, 6, ['a', 'e', 'inc'], nbuf=4)
+	elems=np.random.random([10, 6, 3])
+	for ii in range(10):
+		writer.append(0.1*ii, elems[ii])
+	writer.close()
+	ts,out=series_store.read_elems(fname)
+	assert np.allclose(ts, 0.1*np.arange(10))
+	assert np.array_equal(out['inc'], elems[:,:,2])
+	ts,out=series_store.read_elems(fname, snaps=slice(1, 10, 3), stars=2, names=['e'])
+	assert out.keys()==['e']
+	assert np.array_equal(out['e'], elems[1::3,2,1])
+	ts,out=series_store.read_elems(fname, snaps=[0, 4], stars=[1, 5])
+	assert np.array_equal(out['a'], elems[[0, 4]][:,[1, 5],0])
+
+def test_read_elems_tables():
+	##Files written with one table per snapshot (/bin/{ii} in _vs.h5)
+	fname=os.path.join(tempfile.mkdtemp(), 'vs.h5')
+	elems=np.random.random([12, 4, 2])
+	f=h5py.File(fname, 'w')
+	for ii in range(12):
+		tab=np.empty(4, dtype=[('a', 'f8'), ('vz', 'f8')])
+		tab['a'],tab['vz']=elems[ii].T
+		f.create_dataset('bin/{0}'.format(ii), data=tab)
+	f.close()
+	ts,out=series_store.read_elems(fname, snaps=slice(0, 12, 5))
+	assert ts.shape==(3,)
+	assert np.array_equal(out['vz'], elems[::5,:,1])
+	ts,out=series_store.read_elems(fname, snaps=[2, 11], stars=3, names=['a'])
+	assert np.array_equal(out['a'], elems[[2, 11],3,0])
+	ts,out=series_store.read_elems(fname, snaps=7, stars=[0, 2])
+	assert np.array_equal(out['a'], elems[7,[0, 2],0])
@@ -0,0 +1,31 @@
+import rebound
+from rebound_runs import snap_index
+import numpy as np
+import os
+import tempfile
+
+def test_snapshot_times():
+	##Same times and offsets as rebound, also after the archive is extended by a restart
+	fname=os.path.join(tempfile.mkdtemp(), 'sim.bin')
+	sim=rebound.Simulation()
+	sim.add(m=1.)
+	for ii in range(10):
+		sim.add(m=1.0e-4, a=1.+0.1*ii, M=0.5*ii, primary=sim.particles[0])
+	sim.integrator='leapfrog'
+	sim.dt=1.0e-3
+	sim.automateSimulationArchive(fname, interval=0.1, deletefile=True)
+	sim.integrate(0.55)
+	for tmax in [None, 0.85]:
+		if tmax:
+			sim=rebound.Simulation(fname)
+			sim.simulationarchive_snapshot(fname)
+			sim.dt=1.0e-3
+			sim.automateSimulationArchive(fname, interval=0.1, deletefile=False)
+			sim.integrate(tmax)
+		sa=rebound.SimulationArchive(fname)
+		ts,offsets=snap_index.snapshot_times(fname)
+		assert np.array_equal(ts, sa.t[:len(sa)])
+		assert np.array_equal(offsets, [sa.offset[ii] for ii in range(len(sa))])
+		##Cached index
+		assert np.array_equal(snap_index.snapshot_times(fname)[0], ts)
+	assert open(snap_index.cache_name(fname)).readline().split()[1]==str(os.path.getsize(fname))
@@ -0,0 +1,47 @@
+import sys
+sys.path.append('/usr/local/lib/python2.7/dist-packages/')
+import rebound
+from rebound_runs import tde
+import numpy as np
+import os
+import tempfile
+
+def test_tde_log():
+	fname=os.path.join(tempfile.mkdtemp(), 'sim_tde')
+	sim=rebound.Simulation()
+	sim.G=1.
+	sim.add(m=1., r=5.0e-2)
+	##Star plunging into the SMBH
+	sim.add(m=1.0e-6, a=1., e=0.999, f=np.pi, r=1.0e-6)
+	##Two stars on colliding orbits, far from the SMBH
+	sim.add(m=1.0e-6, a=5., r=1.0e-2)
+	sim.add(m=1.0e-6, a=5., f=1.0e-3, r=1.0e-2)
+	sim.move_to_com()
+	sim.integrator='leapfrog'
+	sim.dt=1.0e-4
+	sim.collision='direct'
+	tdes=tde.TDELog(fname)
+	sim.collision_resolve=tdes
+	sim.integrate(1.1*np.pi)
+	##Nothing is written until the log is flushed
+	assert os.path.getsize(fname)==0
+	tdes.close()
+	lines=[ll.split() for ll in open(fname)]
+	assert len(lines)>0
+	assert all(ll[3]=='1' and ll[4]=='TDE!' for ll in lines)
+	##First disruption at pericenter, half an orbit after the start
+	assert np.isclose(float(lines[0][0]), np.pi, rtol=1.0e-2)
+
+def test_tde_close_all():
+	##Open logs are closed, with their buffered events, by the exit hook; closed logs are dropped
+	fnames=[os.path.join(tempfile.mkdtemp(), 'sim_tde') for ii in range(2)]
+	logs=[tde.TDELog(ff) for ff in fnames]
+	for log in logs:
+		log.lines.append('0. 1. 0.5 1 TDE!\n')
+	logs[0].close()
+	assert logs[0] not in tde.OPEN_LOGS
+	assert logs[1] in tde.OPEN_LOGS
+	tde.close_all()
+	assert len(tde.OPEN_LOGS)==0
+	assert all(log.f.closed for log in logs)
+	assert all(len(open(ff).readlines())==1 for ff in fnames)
@@ -1,11 +1,7 @@
 import sys
-import rebound
-import numpy as np
+from rebound_runs.scan import scan
 
 name=sys.argv[1]
 print name
-sa=rebound.SimulationArchive(name)
-ts = [sim.t for sim in sa]
-ts = np.array(ts)
-
-np.savetxt(name.replace('.bin', '_times'), ts)
\ No newline at end of file
+##Snapshot times (_times) (see scan.py)
+scan(name, ['times'])